@@ -0,0 +1,226 @@
+# amostragem.py
+from __future__ import annotations
+
+import math
+import os
+import secrets
+from collections import deque
+from functools import partial
+from typing import Callable, Iterable, Iterator, Optional, Protocol, Union
+
+import numpy as np
+
+from jogos import LoteJogos
+from processos import MAX_PROCESSOS, obter_executor
+from unicidade import FiltroBloom
+
+# =====================================================
+# Amostragem ponderada sem reposição (vetorizada)
+# =====================================================
+#
+# O gerador antigo sorteava com random.choice num pool expandido e descartava
+# repetidas. Isso equivale a escolher, a cada passo, uma dezena ainda livre com
+# probabilidade proporcional ao seu peso (nº de aparições no pool). O truque
+# "exponential race" (Gumbel-top-k) produz exatamente essa distribuição: cada
+# dezena recebe a chave E/peso, com E ~ Exp(1), e ficam as k menores chaves.
+
+# Jogos sorteados por bloco (limita a memória: bloco × total_numeros floats)
+TAMANHO_BLOCO = 16_384
+
+# Modo sem repetição: desiste após tantos blocos seguidos sem nenhum jogo inédito
+LIMITE_BLOCOS_SEM_PROGRESSO = 50
+
+# A partir de quantos jogos os blocos são sorteados no pool de processos
+MIN_JOGOS_PROCESSOS = int(os.getenv("MEGASURP_GERACAO_MIN_PROCESSOS", "500000"))
+
+# Semente (int), Generator pronto ou None (semente nova)
+FonteAleatoria = Union[int, np.random.Generator, None]
+
+
+# =====================================================
+# Fluxos aleatórios por bloco (reprodutíveis e paralelos)
+# =====================================================
+#
+# Com uma semente, o bloco i sempre usa o filho i de SeedSequence(semente):
+# fluxos independentes, e o resultado não depende de quantos processos sorteiam
+# (nem de qual sorteia cada bloco). Um Generator explícito é usado como fluxo único.
+
+def nova_semente() -> int:
+    return secrets.randbits(63)
+
+
+def gerador_do_bloco(semente: int, i: int) -> np.random.Generator:
+    return np.random.default_rng(np.random.SeedSequence(semente, spawn_key=(i,)))
+
+
+def geradores_por_bloco(rng: FonteAleatoria) -> Callable[[int], np.random.Generator]:
+    """i -> Generator do bloco i."""
+    if isinstance(rng, np.random.Generator):
+        return lambda _i: rng
+    return partial(gerador_do_bloco, nova_semente() if rng is None else int(rng))
+
+
+class ConjuntoMascaras(Protocol):
+    def contem(self, mascaras: np.ndarray) -> np.ndarray: ...
+
+
+def pesos_do_pool(pool: Iterable[int], total_numeros: int) -> np.ndarray:
+    """Vetor de pesos (índice 0 = dezena 1) a partir do pool expandido."""
+    dezenas = np.fromiter(pool, dtype=np.int64)
+    if dezenas.size == 0:
+        raise ValueError("Pool de dezenas vazio.")
+    if dezenas.min() < 1 or dezenas.max() > total_numeros:
+        raise ValueError(f"Pool contém dezenas fora de 1–{total_numeros}.")
+    return np.bincount(dezenas, minlength=total_numeros + 1)[1:].astype(np.float64)
+
+
+def iterar_jogos(
+    pesos: np.ndarray,
+    qtd_jogos: int,
+    qtd_dezenas: int,
+    rng: FonteAleatoria = None,
+    tamanho_bloco: int = TAMANHO_BLOCO,
+    sem_repeticao: bool = False,
+    excluir: Optional[ConjuntoMascaras] = None,
+) -> Iterator[np.ndarray]:
+    """
+    Gera os jogos em blocos de até `tamanho_bloco` linhas (memória constante).
+    Valida na chamada (não no primeiro next), para o erro sair antes do streaming.
+
+    rng: semente (mesma semente -> mesmos jogos, com ou sem processos) ou Generator.
+
+    sem_repeticao: nenhum jogo se repete no lote.
+    excluir: jogos proibidos (ex.: índice do histórico); implica sem_repeticao.
+    """
+    pesos = np.asarray(pesos, dtype=np.float64)
+    total_numeros = pesos.shape[0]
+
+    if qtd_dezenas < 1 or qtd_dezenas > total_numeros:
+        raise ValueError(f"Quantidade de dezenas deve ser entre 1 e {total_numeros}.")
+    disponiveis = int(np.count_nonzero(pesos > 0))
+    if disponiveis < qtd_dezenas:
+        raise RuntimeError("Não foi possível montar um jogo com o pool atual.")
+
+    with np.errstate(divide="ignore"):
+        inverso_pesos = 1.0 / pesos  # peso 0 -> chave infinita (nunca sorteada)
+    if not isinstance(rng, np.random.Generator):
+        rng = nova_semente() if rng is None else int(rng)
+    gerador = geradores_por_bloco(rng)
+
+    if sem_repeticao or excluir is not None:
+        if qtd_jogos > math.comb(disponiveis, qtd_dezenas):
+            raise ValueError("Não existem jogos distintos suficientes para essa quantidade.")
+        return blocos_unicos(
+            lambda i, n: _sortear_bloco(inverso_pesos, n, qtd_dezenas, gerador(i)),
+            qtd_jogos,
+            tamanho_bloco,
+            excluir,
+        )
+    if isinstance(rng, int) and MAX_PROCESSOS > 1 and qtd_jogos >= MIN_JOGOS_PROCESSOS:
+        return _blocos_em_paralelo(inverso_pesos, qtd_jogos, qtd_dezenas, rng, tamanho_bloco)
+    return _blocos(inverso_pesos, qtd_jogos, qtd_dezenas, gerador, tamanho_bloco)
+
+
+def _sortear_bloco(
+    inverso_pesos: np.ndarray,
+    n: int,
+    qtd_dezenas: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    chaves = rng.standard_exponential(size=(n, inverso_pesos.shape[0]))
+    chaves *= inverso_pesos
+    indices = np.argpartition(chaves, qtd_dezenas - 1, axis=1)[:, :qtd_dezenas]
+    indices.sort(axis=1)
+    return (indices + 1).astype(np.uint8)
+
+
+def tamanhos_dos_blocos(qtd_jogos: int, tamanho_bloco: int) -> Iterator[int]:
+    for inicio in range(0, qtd_jogos, tamanho_bloco):
+        yield min(tamanho_bloco, qtd_jogos - inicio)
+
+
+def _blocos(
+    inverso_pesos: np.ndarray,
+    qtd_jogos: int,
+    qtd_dezenas: int,
+    gerador: Callable[[int], np.random.Generator],
+    tamanho_bloco: int,
+) -> Iterator[np.ndarray]:
+    for i, n in enumerate(tamanhos_dos_blocos(qtd_jogos, tamanho_bloco)):
+        yield _sortear_bloco(inverso_pesos, n, qtd_dezenas, gerador(i))
+
+
+def _sortear_bloco_da_semente(
+    inverso_pesos: np.ndarray,
+    n: int,
+    qtd_dezenas: int,
+    semente: int,
+    i: int,
+) -> np.ndarray:
+    return _sortear_bloco(inverso_pesos, n, qtd_dezenas, gerador_do_bloco(semente, i))
+
+
+def _blocos_em_paralelo(
+    inverso_pesos: np.ndarray,
+    qtd_jogos: int,
+    qtd_dezenas: int,
+    semente: int,
+    tamanho_bloco: int,
+) -> Iterator[np.ndarray]:
+    """Mesmos blocos de _blocos, sorteados no pool de processos e entregues em ordem."""
+    executor = obter_executor()
+    pendentes: deque = deque()
+    for i, n in enumerate(tamanhos_dos_blocos(qtd_jogos, tamanho_bloco)):
+        pendentes.append(
+            executor.submit(_sortear_bloco_da_semente, inverso_pesos, n, qtd_dezenas, semente, i)
+        )
+        # Poucos blocos em voo: a memória não cresce com a quantidade
+        if len(pendentes) >= 2 * MAX_PROCESSOS:
+            yield pendentes.popleft().result()
+    while pendentes:
+        yield pendentes.popleft().result()
+
+
+def blocos_unicos(
+    sortear_bloco: Callable[[int, int], np.ndarray],
+    qtd_jogos: int,
+    tamanho_bloco: int,
+    excluir: Optional[ConjuntoMascaras],
+) -> Iterator[np.ndarray]:
+    """
+    Blocos sem jogos repetidos (nem proibidos por `excluir`), a partir de
+    qualquer sorteador de blocos: sortear_bloco(i, n) -> matriz (n, qtd_dezenas)
+    do i-ésimo bloco sorteado.
+    """
+    # Jogos já entregues neste lote (Bloom: memória ~2 bytes/jogo mesmo em lotes enormes)
+    vistos = FiltroBloom(capacidade_inicial=max(1, min(qtd_jogos, 1_000_000)))
+    restantes = qtd_jogos
+    sem_progresso = 0
+    i = 0
+
+    while restantes > 0:
+        n = min(tamanho_bloco, max(2 * restantes, 64))
+        matriz = sortear_bloco(i, n)
+        i += 1
+        mascaras = LoteJogos.de_matriz(matriz).mascaras
+
+        # Repetidos dentro do próprio bloco (mantém a ordem do sorteio)
+        _valores, primeiros = np.unique(mascaras, return_index=True)
+        primeiros.sort()
+        matriz, mascaras = matriz[primeiros], mascaras[primeiros]
+
+        novos = ~vistos.contem(mascaras)
+        if excluir is not None:
+            novos &= ~excluir.contem(mascaras)
+        matriz, mascaras = matriz[novos][:restantes], mascaras[novos][:restantes]
+
+        if not len(mascaras):
+            sem_progresso += 1
+            if sem_progresso > LIMITE_BLOCOS_SEM_PROGRESSO:
+                raise RuntimeError("Não foi possível gerar jogos inéditos com o pool atual.")
+            continue
+
+        sem_progresso = 0
+        vistos.adicionar(mascaras)
+        yield matriz
+        restantes -= len(mascaras)
@@ -0,0 +1,189 @@
+# atualizador.py
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import core
+import core_lotofacil
+import sorteios
+
+# =====================================================
+# Atualização dos pools em background (pré-aquecimento)
+# =====================================================
+#
+# Uma thread por processo atualiza os pools da Mega-Sena e da Lotofácil antes
+# de vencerem, então /gerar e /lotofacil/gerar só leem o pool em memória.
+# Perto do horário dos sorteios a frequência aumenta.
+
+# Liga/desliga (MEGASURP_REFRESHER=0 desliga)
+ATUALIZADOR_ATIVO = os.getenv("MEGASURP_REFRESHER", "1") != "0"
+
+# Intervalo normal (segundos). Deve ser menor que MEGASURP_POOL_TTL.
+INTERVALO_PADRAO = float(os.getenv("MEGASURP_REFRESH_INTERVAL", "900"))
+
+# Intervalo na janela do sorteio (resultado pode sair a qualquer momento)
+INTERVALO_SORTEIO = float(os.getenv("MEGASURP_REFRESH_INTERVAL_SORTEIO", "120"))
+
+# Após erro, tenta de novo mais cedo
+INTERVALO_ERRO = float(os.getenv("MEGASURP_REFRESH_INTERVAL_ERRO", "60"))
+
+# Sorteios às 20h (horário de Brasília, sem horário de verão desde 2019).
+FUSO_BRASILIA = timezone(timedelta(hours=-3))
+JANELA_SORTEIO = (20, 23)  # das 20h às 23h
+
+# weekday(): segunda = 0
+DIAS_SORTEIO = {
+    "megasena": {1, 3, 5},  # terça, quinta e sábado
+    "lotofacil": {0, 1, 2, 3, 4, 5},  # segunda a sábado
+}
+
+# jogo -> (atualizar pool, concurso em cache)
+JOGOS: Dict[str, Tuple[Callable[[], Tuple[List[int], str, str, str]], Callable[[], Optional[int]]]] = {
+    "megasena": (core.atualizar_pool_com_globo_com_status, core.concurso_em_cache),
+    "lotofacil": (
+        core_lotofacil.atualizar_pool_lotofacil_com_status,
+        core_lotofacil.concurso_em_cache,
+    ),
+}
+
+
+def _agora_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def em_janela_de_sorteio(jogo: str, agora: Optional[datetime] = None) -> bool:
+    agora_br = (agora or datetime.now(timezone.utc)).astimezone(FUSO_BRASILIA)
+    inicio, fim = JANELA_SORTEIO
+    return agora_br.weekday() in DIAS_SORTEIO.get(jogo, set()) and inicio <= agora_br.hour < fim
+
+
+def segundos_ate_janela(jogo: str, agora: Optional[datetime] = None) -> Optional[float]:
+    """Segundos até a próxima janela de sorteio (None se o jogo não tem agenda)."""
+    dias = DIAS_SORTEIO.get(jogo)
+    if not dias:
+        return None
+
+    agora_br = (agora or datetime.now(timezone.utc)).astimezone(FUSO_BRASILIA)
+    inicio = agora_br.replace(hour=JANELA_SORTEIO[0], minute=0, second=0, microsecond=0)
+    for dias_a_frente in range(8):
+        candidato = inicio + timedelta(days=dias_a_frente)
+        if candidato > agora_br and candidato.weekday() in dias:
+            return (candidato - agora_br).total_seconds()
+    return None
+
+
+class Atualizador:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._parar = threading.Event()
+        self._proxima: Dict[str, float] = {}
+        self._estado: Dict[str, dict] = {
+            jogo: {
+                "concurso": None,
+                "modo": None,
+                "fonte": None,
+                "ultimo_sucesso": None,
+                "ultimo_erro": None,
+                "ultimo_erro_em": None,
+                "proxima_atualizacao": None,
+            }
+            for jogo in JOGOS
+        }
+
+    def garantir_iniciado(self) -> None:
+        """
+        Idempotente e seguro com gunicorn: threads não sobrevivem ao fork,
+        então cada worker (pid novo) inicia a sua.
+        """
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._parar.clear()
+            self._proxima = {jogo: 0.0 for jogo in JOGOS}
+            self._thread = threading.Thread(
+                target=self._loop, name="atualizador-pools", daemon=True
+            )
+            self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+
+    def estado(self) -> Dict[str, dict]:
+        with self._lock:
+            estado = {jogo: dict(info) for jogo, info in self._estado.items()}
+
+        for jogo, info in estado.items():
+            info["janela_sorteio"] = em_janela_de_sorteio(jogo)
+        return {
+            "ativo": self._thread is not None and self._thread.is_alive(),
+            "jogos": estado,
+        }
+
+    def atualizar_jogo(self, jogo: str) -> float:
+        """Atualiza um jogo agora. Retorna o intervalo até a próxima atualização."""
+        atualizar, concurso_em_cache = JOGOS[jogo]
+
+        try:
+            _pool, modo, fonte, mensagem = atualizar()
+        except Exception as e:
+            modo, fonte, mensagem = None, None, f"{type(e).__name__}: {e}"
+
+        concurso = concurso_em_cache() if modo == "online" else None
+        if concurso is not None:
+            try:
+                # Concurso novo entra no histórico completo (e nas estatísticas)
+                sorteios.completar(jogo)
+            except Exception:
+                pass
+
+        with self._lock:
+            info = self._estado[jogo]
+            info["modo"] = modo
+            info["fonte"] = fonte
+            if modo == "online":
+                info["ultimo_sucesso"] = _agora_iso()
+                info["concurso"] = concurso
+            else:
+                # Fallback (cache/offline) conta como erro de atualização
+                info["ultimo_erro"] = mensagem
+                info["ultimo_erro_em"] = _agora_iso()
+
+        if modo != "online":
+            return INTERVALO_ERRO
+        if em_janela_de_sorteio(jogo):
+            return INTERVALO_SORTEIO
+
+        # Não "dorme" para dentro da janela do sorteio
+        ate_janela = segundos_ate_janela(jogo)
+        if ate_janela is not None:
+            return max(1.0, min(INTERVALO_PADRAO, ate_janela))
+        return INTERVALO_PADRAO
+
+    def _loop(self) -> None:
+        while not self._parar.is_set():
+            agora = time.monotonic()
+            for jogo in JOGOS:
+                if self._proxima[jogo] <= agora:
+                    intervalo = self.atualizar_jogo(jogo)
+                    self._proxima[jogo] = time.monotonic() + intervalo
+                    with self._lock:
+                        self._estado[jogo]["proxima_atualizacao"] = (
+                            datetime.now() + timedelta(seconds=intervalo)
+                        ).isoformat(timespec="seconds")
+
+            espera = max(1.0, min(self._proxima.values()) - time.monotonic())
+            self._parar.wait(espera)
+
+
+ATUALIZADOR = Atualizador()
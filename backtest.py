@@ -0,0 +1,148 @@
+# backtest.py
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, TextIO
+
+import numpy as np
+
+from jogos import LoteJogos, MAX_DEZENA
+from processos import MAX_PROCESSOS, obter_executor
+from sorteios import TOTAL_DEZENAS, HistoricoVazio, carregar_sorteios
+
+# =====================================================
+# Backtest: jogos × todos os sorteios do histórico
+# =====================================================
+#
+# Acertos = popcount(jogo & sorteio) sobre as máscaras de bits. Os jogos vão
+# em blocos pequenos (cabem no cache L2) contra todos os sorteios de uma vez;
+# só as posições com acertos premiados são contadas. Lotes grandes são
+# divididos entre processos (~4 ns por par jogo × sorteio em cada núcleo).
+
+# Acertos que valem prêmio, por jogo
+FAIXAS: Dict[str, Dict[int, str]] = {
+    "megasena": {4: "quadra", 5: "quina", 6: "sena"},
+    "lotofacil": {n: f"{n} acertos" for n in range(11, 16)},
+}
+
+# Jogos por bloco no laço interno (bloco × qtd_sorteios bytes por matriz)
+BLOCO_JOGOS = 256
+
+# A partir de quantos jogos vale a pena dividir entre processos
+MIN_JOGOS_PROCESSOS = int(os.getenv("MEGASURP_BACKTEST_MIN_PROCESSOS", "200000"))
+
+# Partes em que o lote é dividido (padrão: MEGASURP_PROCESSOS). 1 desliga o paralelismo.
+PROCESSOS = int(os.getenv("MEGASURP_BACKTEST_PROCESSOS", str(MAX_PROCESSOS)))
+
+
+def contar_acertos(
+    mascaras_jogos: np.ndarray,
+    mascaras_sorteios: np.ndarray,
+    minimo: int,
+) -> np.ndarray:
+    """
+    Retorna vetor de MAX_DEZENA + 2 posições: [0..MAX_DEZENA] = pares jogo × sorteio
+    com exatamente n acertos (só n >= minimo é preenchido) e a última = jogos
+    premiados ao menos uma vez.
+    """
+    mascaras_jogos = np.ascontiguousarray(mascaras_jogos, dtype=np.uint64)
+    sorteios = np.ascontiguousarray(mascaras_sorteios, dtype=np.uint64)[None, :]
+    contagem = np.zeros(MAX_DEZENA + 2, dtype=np.int64)
+    if mascaras_jogos.size == 0 or sorteios.size == 0:
+        return contagem
+
+    forma = (min(BLOCO_JOGOS, mascaras_jogos.shape[0]), sorteios.shape[1])
+    e = np.empty(forma, dtype=np.uint64)
+    acertos = np.empty(forma, dtype=np.uint8)
+    premiado = np.empty(forma, dtype=bool)
+
+    for inicio in range(0, mascaras_jogos.shape[0], BLOCO_JOGOS):
+        bloco = mascaras_jogos[inicio : inicio + BLOCO_JOGOS, None]
+        n = bloco.shape[0]
+        np.bitwise_and(bloco, sorteios, out=e[:n])
+        np.bitwise_count(e[:n], out=acertos[:n])
+        np.greater_equal(acertos[:n], minimo, out=premiado[:n])
+
+        contagem[:-1] += np.bincount(acertos[:n][premiado[:n]], minlength=MAX_DEZENA + 1)
+        contagem[-1] += int(np.count_nonzero(premiado[:n].any(axis=1)))
+    return contagem
+
+
+def _contar_em_paralelo(mascaras_jogos: np.ndarray, mascaras_sorteios: np.ndarray, minimo: int) -> np.ndarray:
+    if PROCESSOS <= 1 or mascaras_jogos.shape[0] < MIN_JOGOS_PROCESSOS:
+        return contar_acertos(mascaras_jogos, mascaras_sorteios, minimo)
+
+    partes = np.array_split(mascaras_jogos, PROCESSOS)
+    sorteios = np.asarray(mascaras_sorteios)
+    executor = obter_executor()
+    futuros = [executor.submit(contar_acertos, parte, sorteios, minimo) for parte in partes]
+    return sum(f.result() for f in futuros)
+
+
+def backtest(jogo: str, lote: LoteJogos) -> dict:
+    """Pontua o lote contra todos os sorteios de `jogo` no histórico (sorteios.py)."""
+    faixas = FAIXAS.get(jogo)
+    if faixas is None:
+        raise ValueError(f"Jogo desconhecido: {jogo}")
+
+    total = TOTAL_DEZENAS[jogo]
+    if len(lote) and int(np.bitwise_or.reduce(lote.mascaras)) >> total:
+        raise ValueError(f"Jogos com dezenas fora de 1–{total}.")
+
+    sorteios = carregar_sorteios(jogo)
+    if len(sorteios) == 0:
+        raise HistoricoVazio(jogo)
+
+    inicio = time.perf_counter()
+    contagem = _contar_em_paralelo(lote.mascaras, sorteios.mascaras, min(faixas))
+
+    return {
+        "jogo": jogo,
+        "qtd_jogos": len(lote),
+        "qtd_sorteios": len(sorteios),
+        "concursos": [int(sorteios.concurso[0]), int(sorteios.concurso[-1])],
+        "faixas": {nome: int(contagem[acertos]) for acertos, nome in faixas.items()},
+        # Jogos com mais dezenas podem acertar além da maior faixa (ex.: 7 em 10 dezenas)
+        "acertos": {
+            str(acertos): int(contagem[acertos])
+            for acertos in range(min(faixas), MAX_DEZENA + 1)
+            if contagem[acertos]
+        },
+        "jogos_premiados": int(contagem[-1]),
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+
+
+# =====================================================
+# Job em lote (NDJSON: um jogo por linha, como /api/<jogo>/gerar)
+# =====================================================
+
+def ler_ndjson(arquivo: TextIO) -> Iterable[List[int]]:
+    for linha in arquivo:
+        linha = linha.strip()
+        if linha:
+            yield json.loads(linha)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backtest de jogos contra o histórico de sorteios.")
+    parser.add_argument("jogo", choices=sorted(FAIXAS))
+    parser.add_argument("arquivo", nargs="?", default="-", help="NDJSON com um jogo por linha (padrão: stdin)")
+    args = parser.parse_args(argv)
+
+    if args.arquivo == "-":
+        lote = LoteJogos.de_listas(ler_ndjson(sys.stdin))
+    else:
+        with open(args.arquivo, encoding="utf-8") as f:
+            lote = LoteJogos.de_listas(ler_ndjson(f))
+
+    print(json.dumps(backtest(args.jogo, lote), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
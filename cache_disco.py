@@ -0,0 +1,195 @@
+# cache_disco.py
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# =====================================================
+# Cache JSON em disco, seguro com vários workers
+# =====================================================
+#
+# - Escrita atômica: grava num temporário na mesma pasta e faz os.replace.
+#   Quem lê vê o arquivo antigo inteiro ou o novo inteiro, nunca um pedaço.
+# - Um escritor por vez entre processos (lock no arquivo "<cache>.lock").
+#   Se outro worker já está gravando, este desiste: o outro grava o mesmo dado.
+# - Leitura com recarga por mtime: o JSON só é parseado de novo se o arquivo mudou.
+
+
+def _travar(fd: int, bloquear: bool) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX if bloquear else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_LOCK if bloquear else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _destravar(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def trava_arquivo(path: Path, bloquear: bool = True) -> Iterator[bool]:
+    """
+    Lock exclusivo entre processos sobre `path` (criado se não existir).
+    Devolve True se obteve o lock; com bloquear=False, False se outro processo o tem.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if not _travar(fd, bloquear):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _destravar(fd)
+    finally:
+        os.close(fd)
+
+
+class Lideranca:
+    """
+    Lock entre processos mantido enquanto o processo viver (eleição de líder).
+    Se o líder morre, o sistema operacional libera o lock e o próximo
+    processo que chamar tentar() assume.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def tentar(self) -> bool:
+        pid = os.getpid()
+        with self._lock:
+            if self._pid != pid and self._fd is not None:
+                # fd herdado no fork: o lock continua sendo do processo pai
+                os.close(self._fd)
+                self._fd = None
+            if self._fd is not None:
+                return True
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if not _travar(fd, bloquear=False):
+                os.close(fd)
+                return False
+            self._fd, self._pid = fd, pid
+            return True
+
+
+def escrever_atomico(path: Path, dados: bytes) -> None:
+    """Temporário na mesma pasta + fsync + os.replace (atômico no mesmo sistema de arquivos)."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class CacheJson:
+    """
+    Cache de um jogo em disco. O dict devolvido por ler() é compartilhado
+    entre chamadas enquanto o arquivo não muda: trate como somente leitura.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        mais_novo: Optional[Callable[[dict, dict], bool]] = None,
+    ) -> None:
+        self.path = path
+        self._lock_path = path.with_name(path.name + ".lock")
+        # (novo, atual) -> True se pode sobrescrever; evita um worker atrasado regredir o cache
+        self._mais_novo = mais_novo
+        self._pasta_pronta = False
+        self._lock = threading.Lock()
+        self._assinatura: Optional[Tuple[int, int, int]] = None
+        self._dados: Optional[dict] = None
+
+    def _garantir_pasta(self) -> None:
+        if not self._pasta_pronta:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._pasta_pronta = True
+
+    def ler(self) -> Optional[dict]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+
+        assinatura = (st.st_mtime_ns, st.st_size, st.st_ino)
+        with self._lock:
+            if assinatura == self._assinatura:
+                return self._dados
+
+        try:
+            dados = json.loads(self.path.read_bytes())
+        except Exception:
+            return None
+        if not isinstance(dados, dict):
+            return None
+
+        with self._lock:
+            self._assinatura, self._dados = assinatura, dados
+        return dados
+
+    def salvar(self, payload: dict) -> bool:
+        """
+        Grava se nenhum outro processo estiver gravando e se o payload não for
+        mais antigo que o do disco. Retorna True se gravou.
+        """
+        self._garantir_pasta()
+        dados = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+        with trava_arquivo(self._lock_path, bloquear=False) as travado:
+            if not travado:
+                return False
+
+            atual = self.ler()
+            if atual and self._mais_novo is not None and not self._mais_novo(payload, atual):
+                return False
+
+            escrever_atomico(self.path, dados)
+
+        # Já deixa o dict em memória (evita reparsear o que acabamos de escrever)
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return True
+        with self._lock:
+            self._assinatura, self._dados = (st.st_mtime_ns, st.st_size, st.st_ino), payload
+        return True
+
+
+def concurso_nao_regride(novo: dict, atual: dict) -> bool:
+    try:
+        return int(novo.get("ultimo_concurso") or 0) >= int(atual.get("ultimo_concurso") or 0)
+    except (TypeError, ValueError):
+        return True
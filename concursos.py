@@ -0,0 +1,71 @@
+# concursos.py
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from upstream import buscar_em_paralelo
+
+# =====================================================
+# Resultados por concurso (armazenados no cache de cada jogo)
+# =====================================================
+#
+# Formato no cache:  "concursos": {"2801": [4, 15, 23, 38, 41, 56], ...}
+# Chaves em string porque o cache é JSON.
+
+
+def concursos_do_cache(cache: Optional[dict]) -> Dict[int, List[int]]:
+    """Concursos já armazenados no cache (vazio se cache antigo/inexistente)."""
+    if not cache or not isinstance(cache.get("concursos"), dict):
+        return {}
+
+    armazenados: Dict[int, List[int]] = {}
+    for numero, dezenas in cache["concursos"].items():
+        try:
+            armazenados[int(numero)] = [int(d) for d in dezenas]
+        except (TypeError, ValueError):
+            continue
+    return armazenados
+
+
+def concursos_para_cache(janela: Dict[int, List[int]]) -> Dict[str, List[int]]:
+    return {str(numero): dezenas for numero, dezenas in janela.items()}
+
+
+def atualizar_janela(
+    armazenados: Dict[int, List[int]],
+    ultimo_concurso: int,
+    tamanho: int,
+    obter_concurso: Callable[[int], dict],
+) -> Tuple[Dict[int, List[int]], int]:
+    """
+    Retorna: (janela, qtd_baixados)
+
+    A janela são os `tamanho` concursos até `ultimo_concurso`, do mais recente
+    ao mais antigo. Só os concursos que ainda não estão armazenados vão à API.
+    """
+    alvo = range(ultimo_concurso, ultimo_concurso - tamanho, -1)
+    faltantes = [numero for numero in alvo if numero not in armazenados]
+
+    baixados = 0
+    novos: Dict[int, List[int]] = {}
+    for numero, dados in zip(faltantes, buscar_em_paralelo(obter_concurso, faltantes)):
+        # Blindagem leve: concurso sem dezenas não é armazenado (tenta de novo depois)
+        lista_dezenas = dados.get("listaDezenas") or []
+        if lista_dezenas:
+            novos[numero] = [int(d) for d in lista_dezenas]
+            baixados += 1
+
+    janela: Dict[int, List[int]] = {}
+    for numero in alvo:
+        dezenas = novos.get(numero, armazenados.get(numero))
+        if dezenas:
+            janela[numero] = dezenas
+    return janela, baixados
+
+
+def pool_da_janela(janela: Dict[int, List[int]]) -> List[int]:
+    """Pool bruto (dezenas repetidas por aparição), do concurso mais recente ao mais antigo."""
+    pool: List[int] = []
+    for numero in sorted(janela, reverse=True):
+        pool.extend(janela[numero])
+    return pool
@@ -1,27 +1,38 @@
 # core.py
 from __future__ import annotations
 
-import json
 import os
-import random
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 
+import numpy as np
 import requests
 
+from amostragem import ConjuntoMascaras, FonteAleatoria, iterar_jogos, pesos_do_pool
+from cache_disco import CacheJson, concurso_nao_regride
+from concursos import (
+    atualizar_janela,
+    concursos_do_cache,
+    concursos_para_cache,
+    pool_da_janela,
+)
+from fechamento import gerar_fechamento
+from jogos import LoteJogos
+from pool_cache import DEFAULT_TTL, DEFAULT_TTL_FALLBACK, PoolCache
+from pool_compartilhado import PoolCompartilhado
+from restricoes import Restricoes, iterar_jogos_restritos
+from upstream import obter_json
+
 # ✅ API alternativa (formato compatível com a lógica inicial)
 # Ex.: https://api.guidi.dev.br/loteria/megasena/ultimo  :contentReference[oaicite:1]{index=1}
 API_ALT_BASE = "https://api.guidi.dev.br/loteria/megasena"
 API_ALT_ULTIMO = f"{API_ALT_BASE}/ultimo"
 
-COMMON_HEADERS = {
-    "Accept": "application/json, text/plain, */*",
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/126.0 Safari/537.36"
-    ),
-}
+TOTAL_DEZENAS = 60
+
+# Concursos na janela do pool (o campo do cache segue "pool_ultimos_10" por compatibilidade).
+# Janelas longas e outras ponderações: ponderacao.py
+JANELA_CONCURSOS = int(os.getenv("MEGASURP_JANELA_MEGASENA", "10"))
 
 # Cache: por padrão vai para ~/.local/share/MegaSurpresinhas/cache_megasena.json
 # Sobrescrever com env var MEGASURP_CACHE_PATH (útil no Render)
@@ -32,59 +43,29 @@ DEFAULT_CACHE_PATH = (
 )
 
 
+# Escrita atômica + lock entre workers; leitura só reparseia se o arquivo mudou
+_CACHE = CacheJson(DEFAULT_CACHE_PATH, mais_novo=concurso_nao_regride)
+
+
 def _cache_path() -> Path:
-    path = DEFAULT_CACHE_PATH
-    path.parent.mkdir(parents=True, exist_ok=True)
-    return path
+    return _CACHE.path
 
 
 def _salvar_cache(payload: dict) -> None:
-    path = _cache_path()
-    path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    _CACHE.salvar(payload)
 
 
 def _ler_cache() -> Optional[dict]:
-    path = _cache_path()
-    if not path.exists():
-        return None
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        return None
+    return _CACHE.ler()
 
 
 def obter_ultimo_concurso_alt() -> int:
-    resp = requests.get(API_ALT_ULTIMO, headers=COMMON_HEADERS, timeout=15)
-    resp.raise_for_status()
-    dados = resp.json()
+    dados = obter_json(API_ALT_ULTIMO)
     return int(dados["numero"])
 
 
 def obter_concurso_alt(numero_concurso: int) -> dict:
-    url = f"{API_ALT_BASE}/{numero_concurso}"
-    resp = requests.get(url, headers=COMMON_HEADERS, timeout=15)
-    resp.raise_for_status()
-    return resp.json()
-
-
-def coletar_ultimos_10_resultados_alt() -> List[int]:
-    ultimo_concurso = obter_ultimo_concurso_alt()
-    pool: List[int] = []
-
-    for concurso in range(ultimo_concurso, ultimo_concurso - 10, -1):
-        dados = obter_concurso_alt(concurso)
-
-        # Blindagem leve
-        lista_dezenas = dados.get("listaDezenas") or []
-        if not lista_dezenas:
-            continue
-
-        dezenas_int = [int(d) for d in lista_dezenas]
-        pool.extend(dezenas_int)
-
-    if not pool:
-        raise RuntimeError("Não foi possível coletar dezenas na API alternativa.")
-    return pool
+    return obter_json(f"{API_ALT_BASE}/{numero_concurso}")
 
 
 def preparar_pool_com_globo() -> List[int]:
@@ -102,21 +83,53 @@ def preparar_pool_com_globo_com_status() -> Tuple[List[int], str, str, str]:
 
     modo:  "online" | "cache" | "offline"
     fonte: "api_alt" | "cache" | "estatistico"
+
+    Servido do pool publicado pelo worker líder enquanto estiver válido;
+    senão, do cache em memória (TTL, atualização em background).
     """
+    pool, modo, fonte, mensagem = _POOL_COMPARTILHADO.ler_fresco() or _POOL_CACHE.obter()
+    return list(pool), modo, fonte, mensagem
+
+
+def atualizar_pool_com_globo_com_status() -> Tuple[List[int], str, str, str]:
+    """Força a busca agora e atualiza o cache em memória (usado pelo atualizador)."""
+    pool, modo, fonte, mensagem = _POOL_CACHE.atualizar()
+    return list(pool), modo, fonte, mensagem
+
+
+def concurso_em_cache() -> Optional[int]:
+    cache = _ler_cache()
+    if cache and cache.get("ultimo_concurso") is not None:
+        return int(cache["ultimo_concurso"])
+    return None
+
+
+def _buscar_pool_com_status() -> Tuple[List[int], str, str, str]:
     # 1) tenta online (API alternativa)
     try:
-        pool = coletar_ultimos_10_resultados_alt()
-        pool.extend(range(1, 61))  # chance mínima p/ todas as dezenas
-
-        # salva cache (último concurso + pool bruto dos últimos 10)
-        _salvar_cache(
-            {
-                "fonte": "api_alt",
-                "ultimo_concurso": obter_ultimo_concurso_alt(),
-                "pool_ultimos_10": pool[:-60],  # só as dezenas vindas dos 10 concursos
-            }
+        # Incremental: só baixa os concursos que ainda não estão no cache
+        cache = _ler_cache()
+        ultimo_concurso = obter_ultimo_concurso_alt()
+        janela, baixados = atualizar_janela(
+            concursos_do_cache(cache), ultimo_concurso, JANELA_CONCURSOS, obter_concurso_alt
         )
 
+        pool = pool_da_janela(janela)
+        if not pool:
+            raise RuntimeError("Não foi possível coletar dezenas na API alternativa.")
+        pool.extend(range(1, TOTAL_DEZENAS + 1))  # chance mínima p/ todas as dezenas
+
+        # salva cache (concursos da janela + pool bruto da janela)
+        if baixados or not cache or cache.get("ultimo_concurso") != ultimo_concurso:
+            _salvar_cache(
+                {
+                    "fonte": "api_alt",
+                    "ultimo_concurso": ultimo_concurso,
+                    "concursos": concursos_para_cache(janela),
+                    "pool_ultimos_10": pool[:-TOTAL_DEZENAS],  # só as dezenas vindas da janela
+                }
+            )
+
         return (
             pool,
             "online",
@@ -125,72 +138,131 @@ def preparar_pool_com_globo_com_status() -> Tuple[List[int], str, str, str]:
         )
 
     except requests.exceptions.RequestException:
-        # 2) tenta cache
-        cache = _ler_cache()
-        if cache and cache.get("pool_ultimos_10"):
-            pool_cache = [int(x) for x in cache["pool_ultimos_10"]]
-            pool_cache.extend(range(1, 61))
-            return (
-                pool_cache,
-                "cache",
-                "cache",
-                "Não foi possível atualizar agora. Usando dados salvos localmente (cache).",
-            )
-
-        # 3) offline / estatístico
-        pool_offline = list(range(1, 61))
-        return (
-            pool_offline,
-            "offline",
-            "estatistico",
-            "Modo offline/Usando gerador estatístico: sem acesso à internet (API) e sem cache disponível.",
-        )
+        # 2) tenta cache, 3) offline / estatístico
+        return _pool_sem_rede()
 
     except Exception:
         # Mesma lógica: tenta cache, senão offline
-        cache = _ler_cache()
-        if cache and cache.get("pool_ultimos_10"):
-            pool_cache = [int(x) for x in cache["pool_ultimos_10"]]
-            pool_cache.extend(range(1, 61))
-            return (
-                pool_cache,
-                "cache",
-                "cache",
-                "Falha ao processar atualização. Usando dados salvos localmente (cache).",
-            )
-
-        pool_offline = list(range(1, 61))
-        return (
-            pool_offline,
-            "offline",
-            "estatistico",
+        return _pool_sem_rede(
+            "Falha ao processar atualização. Usando dados salvos localmente (cache).",
             "Modo offline/Usando gerador estatístico: falha geral e sem cache disponível.",
         )
 
 
+def _pool_sem_rede(
+    mensagem_cache: str = "Não foi possível atualizar agora. Usando dados salvos localmente (cache).",
+    mensagem_offline: str = "Modo offline/Usando gerador estatístico: sem acesso à internet (API) e sem cache disponível.",
+) -> Tuple[List[int], str, str, str]:
+    cache = _ler_cache()
+    if cache and cache.get("pool_ultimos_10"):
+        pool_cache = [int(x) for x in cache["pool_ultimos_10"]]
+        pool_cache.extend(range(1, TOTAL_DEZENAS + 1))
+        return pool_cache, "cache", "cache", mensagem_cache
+
+    return list(range(1, TOTAL_DEZENAS + 1)), "offline", "estatistico", mensagem_offline
+
+
+def _ttl_do_pool(resultado: Tuple[List[int], str, str, str]) -> float:
+    return DEFAULT_TTL if resultado[1] == "online" else DEFAULT_TTL_FALLBACK
+
+
+# Pool publicado entre workers: só o líder busca na API
+_POOL_COMPARTILHADO = PoolCompartilhado(DEFAULT_CACHE_PATH.with_suffix(".pool"), _ttl_do_pool)
+
+
+def _carregar_pool() -> Tuple[List[int], str, str, str]:
+    return _POOL_COMPARTILHADO.carregar(_buscar_pool_com_status, _pool_sem_rede)
+
+
+_POOL_CACHE: PoolCache[Tuple[List[int], str, str, str]] = PoolCache(
+    _carregar_pool, ttl_de=_ttl_do_pool
+)
+
+
 def gerar_surpresinhas(
     qtd_surpresinhas: int,
     qtd_dezenas: int,
     pool_dezenas: List[int],
+    rng: FonteAleatoria = None,
+    sem_repeticao: bool = False,
+    excluir: Optional[ConjuntoMascaras] = None,
+    pesos: Optional[np.ndarray] = None,
+    restricoes: Optional[Restricoes] = None,
 ) -> List[List[int]]:
-    surpresinhas: List[List[int]] = []
-
-    if not pool_dezenas:
-        raise ValueError("Pool de dezenas vazio.")
-
-    for _ in range(qtd_surpresinhas):
-        jogo: List[int] = []
-        # Evita loop infinito em pools ruins
-        tentativas = 0
-        while len(jogo) < qtd_dezenas:
-            tentativas += 1
-            if tentativas > 10_000:
-                raise RuntimeError("Não foi possível montar um jogo com o pool atual.")
-            numero = random.choice(pool_dezenas)
-            if numero not in jogo:
-                jogo.append(numero)
-
-        jogo.sort()
-        surpresinhas.append(jogo)
-
-    return surpresinhas
+    return gerar_lote_surpresinhas(
+        qtd_surpresinhas, qtd_dezenas, pool_dezenas, rng, sem_repeticao, excluir, pesos, restricoes
+    ).para_listas()
+
+
+def gerar_lote_surpresinhas(
+    qtd_surpresinhas: int,
+    qtd_dezenas: int,
+    pool_dezenas: List[int],
+    rng: FonteAleatoria = None,
+    sem_repeticao: bool = False,
+    excluir: Optional[ConjuntoMascaras] = None,
+    pesos: Optional[np.ndarray] = None,
+    restricoes: Optional[Restricoes] = None,
+) -> LoteJogos:
+    """Mesmo sorteio de gerar_surpresinhas, como lote compacto (1 uint64 por jogo)."""
+    blocos = iterar_surpresinhas(
+        qtd_surpresinhas, qtd_dezenas, pool_dezenas, rng, sem_repeticao, excluir, pesos, restricoes
+    )
+    return LoteJogos.concatenar([LoteJogos.de_matriz(bloco) for bloco in blocos])
+
+
+def iterar_surpresinhas(
+    qtd_surpresinhas: int,
+    qtd_dezenas: int,
+    pool_dezenas: List[int],
+    rng: FonteAleatoria = None,
+    sem_repeticao: bool = False,
+    excluir: Optional[ConjuntoMascaras] = None,
+    pesos: Optional[np.ndarray] = None,
+    restricoes: Optional[Restricoes] = None,
+) -> Iterator[np.ndarray]:
+    """
+    Mesma geração de gerar_surpresinhas, em blocos numpy (qtd, qtd_dezenas).
+    Usada no streaming de lotes grandes.
+
+    rng: semente (mesma semente -> mesmos jogos) ou Generator; None = semente nova.
+    pesos: vetor de pesos pronto (ponderacao.py); se None, vem do pool.
+    restricoes: soma, ímpares, baixas, consecutivas (restricoes.py).
+    """
+    if pesos is None:
+        if not pool_dezenas:
+            raise ValueError("Pool de dezenas vazio.")
+        # Peso de cada dezena = nº de aparições no pool; sorteio sem reposição vetorizado
+        pesos = pesos_do_pool(pool_dezenas, TOTAL_DEZENAS)
+    if restricoes is not None and restricoes.ativa:
+        return iterar_jogos_restritos(
+            pesos, qtd_surpresinhas, qtd_dezenas, restricoes, rng, sem_repeticao=sem_repeticao, excluir=excluir
+        )
+    return iterar_jogos(
+        pesos, qtd_surpresinhas, qtd_dezenas, rng, sem_repeticao=sem_repeticao, excluir=excluir
+    )
+
+
+# =====================================================
+# Fechamento (desdobramento)
+# =====================================================
+
+def gerar_fechamento_megasena(
+    dezenas: List[int],
+    acertos: int,
+    sorteadas: int = 6,
+    qtd_dezenas: int = 6,
+) -> dict:
+    """
+    Menos jogos possível sobre as `dezenas` escolhidas que garantem `acertos`
+    (ex.: quadra) se `sorteadas` delas saírem no concurso (fechamento.py).
+    """
+    if any(not (1 <= int(d) <= TOTAL_DEZENAS) for d in dezenas):
+        raise ValueError(f"Mega-Sena: dezenas devem ser entre 1 e {TOTAL_DEZENAS}.")
+    if not (6 <= qtd_dezenas <= 12):
+        raise ValueError("Mega-Sena: quantidade de dezenas deve ser entre 6 e 12.")
+    if len(dezenas) <= qtd_dezenas:
+        raise ValueError("Mega-Sena: escolha mais dezenas do que as de um jogo.")
+    if sorteadas > 6:
+        raise ValueError("Mega-Sena: no máximo 6 dezenas são sorteadas.")
+    return gerar_fechamento(dezenas, qtd_dezenas, sorteadas, acertos)
@@ -1,13 +1,27 @@
 from __future__ import annotations
 
-import json
 import os
-import random
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 
+import numpy as np
 import requests
 
+from amostragem import ConjuntoMascaras, FonteAleatoria, iterar_jogos, pesos_do_pool
+from cache_disco import CacheJson, concurso_nao_regride
+from concursos import (
+    atualizar_janela,
+    concursos_do_cache,
+    concursos_para_cache,
+    pool_da_janela,
+)
+from fechamento import gerar_fechamento
+from jogos import LoteJogos
+from pool_cache import DEFAULT_TTL, DEFAULT_TTL_FALLBACK, PoolCache
+from pool_compartilhado import PoolCompartilhado
+from restricoes import Restricoes, iterar_jogos_restritos
+from upstream import obter_json
+
 # =====================================================
 # API alternativa – Lotofácil
 # =====================================================
@@ -15,14 +29,10 @@ import requests
 API_ALT_BASE = "https://api.guidi.dev.br/loteria/lotofacil"
 API_ALT_ULTIMO = f"{API_ALT_BASE}/ultimo"
 
-COMMON_HEADERS = {
-    "Accept": "application/json, text/plain, */*",
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/126.0 Safari/537.36"
-    ),
-}
+TOTAL_DEZENAS = 25
+
+# Concursos na janela do pool (o campo do cache segue "pool_ultimos_5" por compatibilidade)
+JANELA_CONCURSOS = int(os.getenv("MEGASURP_JANELA_LOTOFACIL", "5"))
 
 # Cache local (mesma ideia da Mega-Sena)
 DEFAULT_CACHE_PATH = (
@@ -40,25 +50,20 @@ DEFAULT_CACHE_PATH = (
 # Cache helpers
 # =====================================================
 
+# Escrita atômica + lock entre workers; leitura só reparseia se o arquivo mudou
+_CACHE = CacheJson(DEFAULT_CACHE_PATH, mais_novo=concurso_nao_regride)
+
+
 def _cache_path() -> Path:
-    path = DEFAULT_CACHE_PATH
-    path.parent.mkdir(parents=True, exist_ok=True)
-    return path
+    return _CACHE.path
 
 
 def _salvar_cache(payload: dict) -> None:
-    path = _cache_path()
-    path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    _CACHE.salvar(payload)
 
 
 def _ler_cache() -> Optional[dict]:
-    path = _cache_path()
-    if not path.exists():
-        return None
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        return None
+    return _CACHE.ler()
 
 
 # =====================================================
@@ -66,38 +71,14 @@ def _ler_cache() -> Optional[dict]:
 # =====================================================
 
 def obter_ultimo_concurso_alt() -> int:
-    resp = requests.get(API_ALT_ULTIMO, headers=COMMON_HEADERS, timeout=15)
-    resp.raise_for_status()
-    dados = resp.json()
+    dados = obter_json(API_ALT_ULTIMO)
     return int(dados["numero"])
 
 
 def obter_concurso_alt(numero_concurso: int) -> dict:
-    url = f"{API_ALT_BASE}/{numero_concurso}"
-    resp = requests.get(url, headers=COMMON_HEADERS, timeout=15)
-    resp.raise_for_status()
-    return resp.json()
+    return obter_json(f"{API_ALT_BASE}/{numero_concurso}")
 
 
-def coletar_ultimos_5_resultados_alt() -> List[int]:
-    ultimo = obter_ultimo_concurso_alt()
-    pool: List[int] = []
-
-    for concurso in range(ultimo, ultimo - 5, -1):
-        dados = obter_concurso_alt(concurso)
-        dezenas = dados.get("listaDezenas") or []
-        if dezenas:
-            pool.extend(int(d) for d in dezenas)
-
-    if not pool:
-        raise RuntimeError("Não foi possível coletar dados da Lotofácil.")
-    return pool
-
-
-# =====================================================
-# Pool com status (online / cache / offline)
-# =====================================================
-
 def preparar_pool_lotofacil_com_status() -> Tuple[List[int], str, str, str]:
     """
     Retorna:
@@ -105,21 +86,52 @@ def preparar_pool_lotofacil_com_status() -> Tuple[List[int], str, str, str]:
 
     modo:  online | cache | offline
     fonte: api_alt | cache | estatistico
+
+    Servido do pool publicado pelo worker líder enquanto estiver válido;
+    senão, do cache em memória (TTL), com atualização em background.
     """
+    pool, modo, fonte, mensagem = _POOL_COMPARTILHADO.ler_fresco() or _POOL_CACHE.obter()
+    return list(pool), modo, fonte, mensagem
+
+
+def atualizar_pool_lotofacil_com_status() -> Tuple[List[int], str, str, str]:
+    """Força a busca agora e atualiza o cache em memória (usado pelo atualizador)."""
+    pool, modo, fonte, mensagem = _POOL_CACHE.atualizar()
+    return list(pool), modo, fonte, mensagem
+
+
+def concurso_em_cache() -> Optional[int]:
+    cache = _ler_cache()
+    if cache and cache.get("ultimo_concurso") is not None:
+        return int(cache["ultimo_concurso"])
+    return None
 
+
+def _buscar_pool_lotofacil_com_status() -> Tuple[List[int], str, str, str]:
     # 1️⃣ Online (API alternativa)
     try:
-        pool = coletar_ultimos_5_resultados_alt()
-        pool.extend(range(1, 26))
-
-        _salvar_cache(
-            {
-                "fonte": "api_alt",
-                "ultimo_concurso": obter_ultimo_concurso_alt(),
-                "pool_ultimos_5": pool[:-25],
-            }
+        # Incremental: só baixa os concursos que faltam no cache
+        cache = _ler_cache()
+        ultimo = obter_ultimo_concurso_alt()
+        janela, baixados = atualizar_janela(
+            concursos_do_cache(cache), ultimo, JANELA_CONCURSOS, obter_concurso_alt
         )
 
+        pool = pool_da_janela(janela)
+        if not pool:
+            raise RuntimeError("Não foi possível coletar dados da Lotofácil.")
+        pool.extend(range(1, TOTAL_DEZENAS + 1))
+
+        if baixados or not cache or cache.get("ultimo_concurso") != ultimo:
+            _salvar_cache(
+                {
+                    "fonte": "api_alt",
+                    "ultimo_concurso": ultimo,
+                    "concursos": concursos_para_cache(janela),
+                    "pool_ultimos_5": pool[:-TOTAL_DEZENAS],
+                }
+            )
+
         return (
             pool,
             "online",
@@ -132,11 +144,15 @@ def preparar_pool_lotofacil_com_status() -> Tuple[List[int], str, str, str]:
     except Exception:
         pass
 
+    return _pool_sem_rede()
+
+
+def _pool_sem_rede() -> Tuple[List[int], str, str, str]:
     # 2️⃣ Cache local
     cache = _ler_cache()
     if cache and cache.get("pool_ultimos_5"):
         pool_cache = [int(x) for x in cache["pool_ultimos_5"]]
-        pool_cache.extend(range(1, 26))
+        pool_cache.extend(range(1, TOTAL_DEZENAS + 1))
 
         return (
             pool_cache,
@@ -147,13 +163,30 @@ def preparar_pool_lotofacil_com_status() -> Tuple[List[int], str, str, str]:
 
     # 3️⃣ Offline / estatístico
     return (
-        list(range(1, 26)),
+        list(range(1, TOTAL_DEZENAS + 1)),
         "offline",
         "estatistico",
         "Modo offline: gerador estatístico (1–25).",
     )
 
 
+def _ttl_do_pool(resultado: Tuple[List[int], str, str, str]) -> float:
+    return DEFAULT_TTL if resultado[1] == "online" else DEFAULT_TTL_FALLBACK
+
+
+# Pool publicado entre workers: só o líder busca na API
+_POOL_COMPARTILHADO = PoolCompartilhado(DEFAULT_CACHE_PATH.with_suffix(".pool"), _ttl_do_pool)
+
+
+def _carregar_pool() -> Tuple[List[int], str, str, str]:
+    return _POOL_COMPARTILHADO.carregar(_buscar_pool_lotofacil_com_status, _pool_sem_rede)
+
+
+_POOL_CACHE: PoolCache[Tuple[List[int], str, str, str]] = PoolCache(
+    _carregar_pool, ttl_de=_ttl_do_pool
+)
+
+
 def preparar_pool_lotofacil() -> List[int]:
     """
     Versão simples (compatibilidade).
@@ -171,22 +204,85 @@ def gerar_surpresinhas_lotofacil(
     qtd_jogos: int,
     qtd_dezenas: int,
     pool: List[int],
+    rng: FonteAleatoria = None,
+    sem_repeticao: bool = False,
+    excluir: Optional[ConjuntoMascaras] = None,
+    pesos: Optional[np.ndarray] = None,
+    restricoes: Optional[Restricoes] = None,
 ) -> List[List[int]]:
+    return gerar_lote_lotofacil(
+        qtd_jogos, qtd_dezenas, pool, rng, sem_repeticao, excluir, pesos, restricoes
+    ).para_listas()
+
+
+def gerar_lote_lotofacil(
+    qtd_jogos: int,
+    qtd_dezenas: int,
+    pool: List[int],
+    rng: FonteAleatoria = None,
+    sem_repeticao: bool = False,
+    excluir: Optional[ConjuntoMascaras] = None,
+    pesos: Optional[np.ndarray] = None,
+    restricoes: Optional[Restricoes] = None,
+) -> LoteJogos:
+    """Lote compacto (máscaras de 25 bits em uint64)."""
+    blocos = iterar_surpresinhas_lotofacil(
+        qtd_jogos, qtd_dezenas, pool, rng, sem_repeticao, excluir, pesos, restricoes
+    )
+    return LoteJogos.concatenar([LoteJogos.de_matriz(bloco) for bloco in blocos])
+
+
+def iterar_surpresinhas_lotofacil(
+    qtd_jogos: int,
+    qtd_dezenas: int,
+    pool: List[int],
+    rng: FonteAleatoria = None,
+    sem_repeticao: bool = False,
+    excluir: Optional[ConjuntoMascaras] = None,
+    pesos: Optional[np.ndarray] = None,
+    restricoes: Optional[Restricoes] = None,
+) -> Iterator[np.ndarray]:
+    """
+    Versão em blocos numpy (streaming de lotes grandes).
+    rng: semente (mesma semente -> mesmos jogos) ou Generator; None = semente nova.
+    pesos: vetor de pesos pronto (ponderacao.py); se None, vem do pool.
+    restricoes: soma, ímpares, baixas, consecutivas (restricoes.py).
+    """
 
     if not (15 <= qtd_dezenas <= 20):
         raise ValueError("Lotofácil: quantidade de dezenas deve ser entre 15 e 20.")
 
-    jogos: List[List[int]] = []
-
-    for _ in range(qtd_jogos):
-        jogo: List[int] = []
+    if pesos is None:
+        pesos = pesos_do_pool(pool, TOTAL_DEZENAS)
+    if restricoes is not None and restricoes.ativa:
+        return iterar_jogos_restritos(
+            pesos, qtd_jogos, qtd_dezenas, restricoes, rng, sem_repeticao=sem_repeticao, excluir=excluir
+        )
+    return iterar_jogos(
+        pesos, qtd_jogos, qtd_dezenas, rng, sem_repeticao=sem_repeticao, excluir=excluir
+    )
 
-        while len(jogo) < qtd_dezenas:
-            n = random.choice(pool)
-            if n not in jogo:
-                jogo.append(n)
 
-        jogo.sort()
-        jogos.append(jogo)
+# =====================================================
+# Fechamento (desdobramento)
+# =====================================================
 
-    return jogos
+def gerar_fechamento_lotofacil(
+    dezenas: List[int],
+    acertos: int,
+    sorteadas: int = 15,
+    qtd_dezenas: int = 15,
+) -> dict:
+    """
+    Menos jogos possível sobre as `dezenas` escolhidas (ex.: 18–21) que garantem
+    `acertos` se `sorteadas` delas saírem no concurso (fechamento.py).
+    """
+    if any(not (1 <= int(d) <= TOTAL_DEZENAS) for d in dezenas):
+        raise ValueError(f"Lotofácil: dezenas devem ser entre 1 e {TOTAL_DEZENAS}.")
+    if not (15 <= qtd_dezenas <= 20):
+        raise ValueError("Lotofácil: quantidade de dezenas deve ser entre 15 e 20.")
+    if len(dezenas) <= qtd_dezenas:
+        raise ValueError("Lotofácil: escolha mais dezenas do que as de um jogo.")
+    if sorteadas > 15:
+        raise ValueError("Lotofácil: no máximo 15 dezenas são sorteadas.")
+    return gerar_fechamento(dezenas, qtd_dezenas, sorteadas, acertos)
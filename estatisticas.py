@@ -0,0 +1,131 @@
+# estatisticas.py
+from __future__ import annotations
+
+import json
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from sorteios import TOTAL_DEZENAS, Sorteios, carregar_sorteios
+
+# =====================================================
+# Estatísticas por jogo: frequência, atraso e pares
+# =====================================================
+#
+# Vetores indexados por dezena - 1:
+#   frequencia[i]  vezes que a dezena saiu
+#   atraso[i]      concursos desde a última aparição (= nº de concursos se nunca saiu)
+#   pares[i, j]    vezes que i e j saíram juntas (diagonal = frequência)
+#
+# Montadas uma vez a partir do histórico completo (sorteios.py) e atualizadas
+# sorteio a sorteio quando o histórico cresce. Consultas só leem os vetores
+# (e o JSON já serializado).
+
+
+class Estatisticas:
+    def __init__(self, jogo: str, total_dezenas: int) -> None:
+        self.jogo = jogo
+        self.total_dezenas = total_dezenas
+        self.qtd_sorteios = 0
+        self.ultimo_concurso: Optional[int] = None
+        self.frequencia = np.zeros(total_dezenas, dtype=np.int64)
+        self.atraso = np.zeros(total_dezenas, dtype=np.int64)
+        self.pares = np.zeros((total_dezenas, total_dezenas), dtype=np.int64)
+        self._json: Optional[bytes] = None
+
+    @property
+    def etag(self) -> str:
+        return f"{self.jogo}-{self.qtd_sorteios}-{self.ultimo_concurso or 0}"
+
+    def reconstruir(self, sorteios: Sorteios) -> None:
+        """Do zero, vetorizado (uma multiplicação de matrizes para os pares)."""
+        dezenas = np.asarray(sorteios.dezenas, dtype=np.int64) - 1
+        qtd = dezenas.shape[0]
+
+        presenca = np.zeros((qtd, self.total_dezenas), dtype=np.int64)
+        np.put_along_axis(presenca, dezenas, 1, axis=1)
+
+        self.frequencia = presenca.sum(axis=0)
+        self.pares = presenca.T @ presenca
+
+        # Linha da última aparição de cada dezena (-1 se nunca saiu)
+        linhas = np.where(presenca.astype(bool), np.arange(qtd)[:, None], -1)
+        self.atraso = (qtd - 1) - linhas.max(axis=0, initial=-1)
+
+        self.qtd_sorteios = qtd
+        self.ultimo_concurso = sorteios.ultimo_concurso
+        self._json = None
+
+    def ingerir(self, concurso: int, dezenas: np.ndarray) -> None:
+        """Um sorteio novo (mais recente que os já ingeridos): O(total + k²)."""
+        indices = np.asarray(dezenas, dtype=np.int64) - 1
+        self.frequencia[indices] += 1
+        self.pares[np.ix_(indices, indices)] += 1
+        self.atraso += 1
+        self.atraso[indices] = 0
+        self.qtd_sorteios += 1
+        self.ultimo_concurso = int(concurso)
+        self._json = None
+
+    def sincronizar(self, sorteios: Sorteios) -> None:
+        """Ingere só o que é novo; se o histórico mudou no meio (lacuna preenchida), reconstrói."""
+        qtd = self.qtd_sorteios
+        continua = (
+            len(sorteios) >= qtd
+            and (qtd == 0 or int(sorteios.concurso[qtd - 1]) == self.ultimo_concurso)
+        )
+        if not continua or qtd == 0:
+            self.reconstruir(sorteios)
+            return
+
+        for i in range(qtd, len(sorteios)):
+            self.ingerir(int(sorteios.concurso[i]), sorteios.dezenas[i])
+
+    def para_json(self) -> bytes:
+        if self._json is None:
+            self._json = json.dumps(
+                {
+                    "jogo": self.jogo,
+                    "qtd_sorteios": self.qtd_sorteios,
+                    "ultimo_concurso": self.ultimo_concurso,
+                    "dezenas": list(range(1, self.total_dezenas + 1)),
+                    "frequencia": self.frequencia.tolist(),
+                    "atraso": self.atraso.tolist(),
+                    "pares": self.pares.tolist(),
+                },
+                separators=(",", ":"),
+            ).encode("utf-8")
+        return self._json
+
+
+class EstatisticasJogos:
+    """Uma Estatisticas por jogo, sincronizada com o arquivo de sorteios quando ele muda."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._estatisticas: Dict[str, Estatisticas] = {
+            jogo: Estatisticas(jogo, total) for jogo, total in TOTAL_DEZENAS.items()
+        }
+        self._origem: Dict[str, Optional[Sorteios]] = {jogo: None for jogo in TOTAL_DEZENAS}
+
+    def obter(self, jogo: str) -> Estatisticas:
+        estatisticas = self._estatisticas[jogo]
+        sorteios = carregar_sorteios(jogo)  # mesmo objeto enquanto o arquivo não muda
+        if sorteios is self._origem[jogo]:
+            return estatisticas
+
+        with self._lock:
+            if sorteios is not self._origem[jogo]:
+                estatisticas.sincronizar(sorteios)
+                self._origem[jogo] = sorteios
+        return estatisticas
+
+    def json_com_etag(self, jogo: str) -> Tuple[bytes, str]:
+        """(corpo JSON, ETag) consistentes entre si, para a API."""
+        estatisticas = self.obter(jogo)
+        with self._lock:
+            return estatisticas.para_json(), estatisticas.etag
+
+
+ESTATISTICAS = EstatisticasJogos()
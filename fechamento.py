@@ -0,0 +1,296 @@
+# fechamento.py
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache_disco import escrever_atomico
+from processos import MAX_PROCESSOS, obter_executor
+
+# =====================================================
+# Fechamento (desdobramento): covering design
+# =====================================================
+#
+# Dadas n dezenas escolhidas, jogos de k dezenas e a garantia "acertos t se
+# m das escolhidas forem sorteadas": todo subconjunto de m dezenas precisa
+# ter pelo menos t dezenas em comum com algum jogo.
+#
+# Trabalha com as posições 0..n-1 (o resultado vale para quaisquer n dezenas)
+# e com máscaras de bits: "jogo cobre subconjunto" = popcount(jogo & sub) >= t.
+#
+# Guloso aleatorizado: sorteia um subconjunto ainda descoberto, gera jogos
+# candidatos que com certeza o cobrem e fica com o que cobre mais descobertos.
+# Depois remove jogos redundantes. Várias tentativas (sementes) rodam em
+# processos separados e fica o menor fechamento. Resultados vão para o cache.
+
+# Limite de subconjuntos de m dezenas (memória e tempo por tentativa)
+MAX_SUBCONJUNTOS = int(os.getenv("MEGASURP_FECHAMENTO_MAX_SUBCONJUNTOS", "500000"))
+
+# Candidatos avaliados a cada jogo escolhido
+CANDIDATOS = int(os.getenv("MEGASURP_FECHAMENTO_CANDIDATOS", "128"))
+
+# Descobertos usados para estimar o ganho de cada candidato (amostra aleatória)
+AMOSTRA_GANHO = int(os.getenv("MEGASURP_FECHAMENTO_AMOSTRA", "4096"))
+
+# Limite de jogos do fechamento (o guloso para aqui; o mínimo teórico também é checado antes)
+MAX_JOGOS = int(os.getenv("MEGASURP_FECHAMENTO_MAX_JOGOS", "3000"))
+
+# Tempo máximo de cálculo por requisição (segundos)
+TEMPO_MAX = float(os.getenv("MEGASURP_FECHAMENTO_TEMPO_MAX", "10"))
+
+# Tentativas independentes (uma por processo)
+TENTATIVAS = int(os.getenv("MEGASURP_FECHAMENTO_TENTATIVAS", str(max(2, MAX_PROCESSOS))))
+
+# Cache em disco dos fechamentos já calculados (compartilhado entre workers)
+PASTA_CACHE = (
+    Path(os.getenv("MEGASURP_FECHAMENTO_CACHE", ""))
+    if os.getenv("MEGASURP_FECHAMENTO_CACHE")
+    else Path.home() / ".local" / "share" / "MegaSurpresinhas" / "fechamentos"
+)
+
+# Fechamentos mantidos em memória
+MAX_EM_MEMORIA = 64
+
+
+def _subconjuntos(n: int, m: int) -> np.ndarray:
+    """Todas as máscaras de m bits entre n posições, montadas posição a posição."""
+    # por_qtd[i] = máscaras com i bits usando só as posições já vistas
+    por_qtd = [np.zeros(1, dtype=np.uint64)] + [np.empty(0, dtype=np.uint64)] * m
+    for j in range(n):
+        bit = np.uint64(1 << j)
+        por_qtd = [por_qtd[0]] + [
+            np.concatenate([por_qtd[i], por_qtd[i - 1] | bit]) for i in range(1, m + 1)
+        ]
+    return por_qtd[m]
+
+
+class FechamentoGrandeDemais(ValueError):
+    """Parâmetros válidos, mas o fechamento passa dos limites de jogos ou de tempo."""
+
+
+def _cobertos_por_jogo(n: int, k: int, m: int, t: int) -> int:
+    """Quantos m-subconjuntos um jogo cobre (>= t dezenas em comum)."""
+    return sum(math.comb(k, j) * math.comb(n - k, m - j) for j in range(t, min(k, m) + 1))
+
+
+def minimo_de_jogos(n: int, k: int, m: int, t: int) -> int:
+    """Limite inferior trivial: C(n, m) / subconjuntos cobertos por jogo."""
+    return -(-math.comb(n, m) // _cobertos_por_jogo(n, k, m, t))
+
+
+def _validar(n: int, k: int, m: int, t: int) -> None:
+    if not (1 <= k <= n <= 64):
+        raise ValueError("Escolha entre k e 64 dezenas (k = dezenas por jogo).")
+    if not (1 <= m <= n):
+        raise ValueError(f"Sorteadas deve ser entre 1 e {n}.")
+    if not (1 <= t <= min(m, k)):
+        raise ValueError(f"Garantia deve ser entre 1 e {min(m, k)} acertos.")
+    if math.comb(n, m) > MAX_SUBCONJUNTOS:
+        raise FechamentoGrandeDemais(
+            f"Fechamento grande demais: C({n},{m}) = {math.comb(n, m)} subconjuntos "
+            f"(máx. {MAX_SUBCONJUNTOS})."
+        )
+    minimo = minimo_de_jogos(n, k, m, t)
+    if minimo > MAX_JOGOS:
+        raise FechamentoGrandeDemais(
+            f"Fechamento grande demais: pelo menos {minimo} jogos (máx. {MAX_JOGOS})."
+        )
+
+
+def _candidatos(
+    alvo: int,
+    n: int,
+    k: int,
+    t: int,
+    qtd: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """`qtd` jogos aleatórios que contêm t dezenas de `alvo` (logo, o cobrem)."""
+    posicoes_alvo = np.array([i for i in range(n) if alvo >> i & 1], dtype=np.int64)
+
+    chaves = rng.random((qtd, n))
+    escolhidas = np.argpartition(rng.random((qtd, posicoes_alvo.size)), t - 1, axis=1)[:, :t]
+    np.put_along_axis(chaves, posicoes_alvo[escolhidas], -1.0, axis=1)
+
+    posicoes = np.argpartition(chaves, k - 1, axis=1)[:, :k].astype(np.uint64)
+    return np.bitwise_or.reduce(np.left_shift(np.uint64(1), posicoes), axis=1)
+
+
+def _cobertos(jogo: np.uint64, subconjuntos: np.ndarray, t: int) -> np.ndarray:
+    return np.bitwise_count(subconjuntos & jogo) >= t
+
+
+def _remover_redundantes(
+    jogos: List[int],
+    subconjuntos: np.ndarray,
+    cobertura: np.ndarray,
+    t: int,
+    rng: np.random.Generator,
+) -> List[int]:
+    """
+    cobertura[s] = jogos que cobrem o subconjunto s. Uma única contagem
+    (tamanho C(n, m)); a cobertura de cada jogo é recalculada quando preciso.
+    """
+    manter = np.ones(len(jogos), dtype=bool)
+    for i in rng.permutation(len(jogos)):
+        cobre = _cobertos(np.uint64(jogos[i]), subconjuntos, t)
+        if np.all(cobertura[cobre] >= 2):
+            cobertura[cobre] -= 1
+            manter[i] = False
+    return [j for j, m in zip(jogos, manter) if m]
+
+
+def tentativa(n: int, k: int, m: int, t: int, semente: int, prazo: float) -> Optional[List[int]]:
+    """
+    Uma execução do guloso + remoção de redundantes. Retorna máscaras (posições
+    0..n-1), ou None se passar de MAX_JOGOS jogos ou do `prazo` (time.time()).
+    """
+    rng = np.random.default_rng(semente)
+    todos = _subconjuntos(n, m)
+    descobertos = todos
+    cobertura = np.zeros(todos.shape[0], dtype=np.int32)
+
+    jogos: List[int] = []
+    while descobertos.size:
+        if len(jogos) >= MAX_JOGOS or time.time() > prazo:
+            return None
+        alvo = int(descobertos[rng.integers(descobertos.size)])
+        candidatos = _candidatos(alvo, n, k, t, CANDIDATOS, rng)
+        amostra = descobertos
+        if descobertos.size > AMOSTRA_GANHO:
+            amostra = descobertos[rng.integers(descobertos.size, size=AMOSTRA_GANHO)]
+        ganho = (np.bitwise_count(candidatos[:, None] & amostra[None, :]) >= t).sum(axis=1)
+        melhor = candidatos[int(np.argmax(ganho))]
+        jogos.append(int(melhor))
+        cobertura += _cobertos(melhor, todos, t)
+        descobertos = descobertos[~_cobertos(melhor, descobertos, t)]
+
+    return _remover_redundantes(jogos, todos, cobertura, t, rng)
+
+
+def verificar(jogos: Sequence[int], n: int, m: int, t: int) -> bool:
+    """True se os jogos (máscaras sobre 0..n-1) garantem t acertos para todo m-subconjunto."""
+    coberto = np.zeros(math.comb(n, m), dtype=bool)
+    subconjuntos = _subconjuntos(n, m)
+    for jogo in jogos:
+        coberto |= _cobertos(np.uint64(jogo), subconjuntos, t)
+    return bool(coberto.all())
+
+
+# =====================================================
+# Cache (memória + disco) e API do módulo
+# =====================================================
+
+_memoria: "OrderedDict[Tuple[int, int, int, int], List[int]]" = OrderedDict()
+_memoria_lock = threading.Lock()
+
+
+def _arquivo_cache(chave: Tuple[int, int, int, int]) -> Path:
+    return PASTA_CACHE / ("fechamento_%d_%d_%d_%d.json" % chave)
+
+
+def _ler_cache(chave: Tuple[int, int, int, int]) -> Optional[List[int]]:
+    with _memoria_lock:
+        if chave in _memoria:
+            _memoria.move_to_end(chave)
+            return _memoria[chave]
+    try:
+        jogos = [int(j) for j in json.loads(_arquivo_cache(chave).read_bytes())["jogos"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    _guardar_memoria(chave, jogos)
+    return jogos
+
+
+def _guardar_memoria(chave: Tuple[int, int, int, int], jogos: List[int]) -> None:
+    with _memoria_lock:
+        _memoria[chave] = jogos
+        _memoria.move_to_end(chave)
+        if len(_memoria) > MAX_EM_MEMORIA:
+            _memoria.popitem(last=False)
+
+
+def _salvar_cache(chave: Tuple[int, int, int, int], jogos: List[int]) -> None:
+    _guardar_memoria(chave, jogos)
+    try:
+        PASTA_CACHE.mkdir(parents=True, exist_ok=True)
+        n, k, m, t = chave
+        dados = {"n": n, "k": k, "m": m, "t": t, "jogos": jogos}
+        escrever_atomico(_arquivo_cache(chave), json.dumps(dados).encode("utf-8"))
+    except OSError:
+        pass  # sem disco: fica só em memória
+
+
+def calcular_fechamento(n: int, k: int, m: int, t: int) -> Tuple[List[int], bool]:
+    """
+    Fechamento sobre as posições 0..n-1. Retorna (máscaras, veio_do_cache).
+    Tentativas em paralelo (processos) dentro de TEMPO_MAX; fica a menor.
+    FechamentoGrandeDemais se nenhuma terminar dentro dos limites.
+    """
+    _validar(n, k, m, t)
+    chave = (n, k, m, t)
+    em_cache = _ler_cache(chave)
+    if em_cache is not None:
+        return em_cache, True
+
+    prazo = time.time() + TEMPO_MAX
+    if k == n:
+        resultados = [[(1 << n) - 1]]
+    elif TENTATIVAS <= 1 or MAX_PROCESSOS <= 1:
+        # Em sequência: novas tentativas só enquanto sobra tempo
+        resultados = []
+        for semente in range(max(1, TENTATIVAS)):
+            if resultados and time.time() > prazo:
+                break
+            resultados.append(tentativa(n, k, m, t, semente, prazo))
+    else:
+        executor = obter_executor()
+        futuros = [
+            executor.submit(tentativa, n, k, m, t, semente, prazo) for semente in range(TENTATIVAS)
+        ]
+        resultados = [f.result() for f in futuros]
+
+    resultados = [r for r in resultados if r is not None]
+    if not resultados:
+        raise FechamentoGrandeDemais(
+            f"Fechamento grande demais: não terminou em {TEMPO_MAX:g} s / {MAX_JOGOS} jogos."
+        )
+
+    jogos = sorted(min(resultados, key=len))
+    _salvar_cache(chave, jogos)
+    return jogos, False
+
+
+def gerar_fechamento(dezenas: Sequence[int], qtd_dezenas: int, sorteadas: int, acertos: int) -> dict:
+    """
+    Jogos de `qtd_dezenas` sobre as `dezenas` escolhidas que garantem `acertos`
+    se `sorteadas` delas forem sorteadas.
+    """
+    escolhidas = sorted({int(d) for d in dezenas})
+    if len(escolhidas) != len(dezenas):
+        raise ValueError("Dezenas repetidas na escolha.")
+
+    inicio = time.perf_counter()
+    mascaras, do_cache = calcular_fechamento(len(escolhidas), qtd_dezenas, sorteadas, acertos)
+
+    jogos = sorted(
+        [escolhidas[i] for i in range(len(escolhidas)) if mascara >> i & 1] for mascara in mascaras
+    )
+    return {
+        "dezenas": escolhidas,
+        "qtd_dezenas": qtd_dezenas,
+        "sorteadas": sorteadas,
+        "acertos": acertos,
+        "qtd_jogos": len(jogos),
+        "jogos": jogos,
+        "cache": do_cache,
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
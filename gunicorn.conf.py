@@ -0,0 +1,19 @@
+# gunicorn.conf.py
+# Lido automaticamente pelo gunicorn quando iniciado na raiz do projeto.
+
+
+def post_fork(server, worker):
+    # Cada worker inicia a sua thread de atualização dos pools (threads não
+    # sobrevivem ao fork); o before_request do web_app fica só para o servidor
+    # de desenvolvimento.
+    from atualizador import ATUALIZADOR, ATUALIZADOR_ATIVO
+
+    if ATUALIZADOR_ATIVO:
+        ATUALIZADOR.garantir_iniciado()
+
+
+def worker_exit(server, worker):
+    # Grava o histórico que ainda está na fila antes do worker sair
+    from storage import encerrar_gravacao
+
+    encerrar_gravacao()
@@ -0,0 +1,167 @@
+# jogos.py
+from __future__ import annotations
+
+from typing import Iterable, Iterator, List, Sequence, Union
+
+import numpy as np
+
+# =====================================================
+# Jogo como máscara de bits
+# =====================================================
+#
+# Dezena n -> bit (n - 1). Mega-Sena cabe em 60 bits e Lotofácil em 25,
+# então um jogo é um inteiro e um lote é um array uint64 (8 bytes por jogo).
+# Acertos entre dois jogos = popcount(a & b).
+
+MAX_DEZENA = 64
+
+# Linhas desempacotadas por vez em para_matriz (64 bytes por linha)
+BLOCO_MATRIZ = 65536
+
+
+def mascara_de(dezenas: Iterable[int]) -> int:
+    mascara = 0
+    for dezena in dezenas:
+        dezena = int(dezena)
+        if not (1 <= dezena <= MAX_DEZENA):
+            raise ValueError(f"Dezena fora de 1–{MAX_DEZENA}: {dezena}")
+        mascara |= 1 << (dezena - 1)
+    return mascara
+
+
+def _mascara_sem_repetidas(dezenas: Iterable[int]) -> int:
+    dezenas = list(dezenas)
+    mascara = mascara_de(dezenas)
+    if mascara.bit_count() != len(dezenas):
+        raise ValueError(f"Dezena repetida no jogo: {dezenas}")
+    return mascara
+
+
+def dezenas_de(mascara: int) -> List[int]:
+    dezenas: List[int] = []
+    while mascara:
+        bit = mascara & -mascara
+        dezenas.append(bit.bit_length())
+        mascara ^= bit
+    return dezenas
+
+
+class Jogo:
+    """Um jogo (conjunto de dezenas) imutável, com hash O(1)."""
+
+    __slots__ = ("mascara",)
+
+    def __init__(self, mascara: int) -> None:
+        self.mascara = int(mascara)
+
+    @classmethod
+    def de_dezenas(cls, dezenas: Iterable[int]) -> "Jogo":
+        return cls(mascara_de(dezenas))
+
+    def dezenas(self) -> List[int]:
+        return dezenas_de(self.mascara)
+
+    def acertos(self, outro: Union["Jogo", int]) -> int:
+        mascara = outro.mascara if isinstance(outro, Jogo) else int(outro)
+        return (self.mascara & mascara).bit_count()
+
+    def __len__(self) -> int:
+        return self.mascara.bit_count()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.dezenas())
+
+    def __contains__(self, dezena: object) -> bool:
+        return isinstance(dezena, int) and 1 <= dezena <= MAX_DEZENA and bool(
+            self.mascara >> (dezena - 1) & 1
+        )
+
+    def __eq__(self, outro: object) -> bool:
+        return isinstance(outro, Jogo) and self.mascara == outro.mascara
+
+    def __hash__(self) -> int:
+        return hash(self.mascara)
+
+    def __repr__(self) -> str:
+        return f"Jogo({self.dezenas()})"
+
+
+class LoteJogos:
+    """Lote de jogos em um array uint64 de máscaras."""
+
+    __slots__ = ("mascaras",)
+
+    def __init__(self, mascaras: np.ndarray) -> None:
+        self.mascaras = np.ascontiguousarray(mascaras, dtype=np.uint64)
+
+    @classmethod
+    def de_matriz(cls, matriz: np.ndarray) -> "LoteJogos":
+        """Matriz (n, k) de dezenas (1..64) -> lote."""
+        matriz = np.asarray(matriz)
+        if matriz.size == 0:
+            return cls(np.empty(0, dtype=np.uint64))
+        bits = np.left_shift(np.uint64(1), matriz.astype(np.uint64) - np.uint64(1))
+        return cls(np.bitwise_or.reduce(bits, axis=1))
+
+    @classmethod
+    def de_listas(cls, jogos: Iterable[Iterable[int]]) -> "LoteJogos":
+        """Dezena repetida num jogo é erro (ValueError), não se funde em silêncio."""
+        return cls(np.fromiter((_mascara_sem_repetidas(j) for j in jogos), dtype=np.uint64))
+
+    @classmethod
+    def concatenar(cls, lotes: Sequence["LoteJogos"]) -> "LoteJogos":
+        if not lotes:
+            return cls(np.empty(0, dtype=np.uint64))
+        return cls(np.concatenate([lote.mascaras for lote in lotes]))
+
+    def qtd_dezenas(self) -> np.ndarray:
+        return np.bitwise_count(self.mascaras)
+
+    def para_matriz(self) -> np.ndarray:
+        """Lote -> matriz (n, k) uint8 ordenada. Exige o mesmo nº de dezenas em todos."""
+        if len(self) == 0:
+            return np.empty((0, 0), dtype=np.uint8)
+
+        qtds = self.qtd_dezenas()
+        k = int(qtds[0])
+        if not np.all(qtds == k):
+            raise ValueError("Lote com jogos de tamanhos diferentes.")
+
+        # Bits desempacotados byte a byte (uint8), em blocos: memória limitada
+        bytes_ = self.mascaras.astype("<u8", copy=False).view(np.uint8).reshape(-1, 8)
+        matriz = np.empty((len(self), k), dtype=np.uint8)
+        for inicio in range(0, len(self), BLOCO_MATRIZ):
+            bits = np.unpackbits(bytes_[inicio : inicio + BLOCO_MATRIZ], axis=1, bitorder="little")
+            _linhas, colunas = np.nonzero(bits)
+            matriz[inicio : inicio + bits.shape[0]] = colunas.reshape(-1, k) + 1
+        return matriz
+
+    def para_listas(self) -> List[List[int]]:
+        if len(self) == 0:
+            return []
+        try:
+            return self.para_matriz().tolist()
+        except ValueError:
+            return [dezenas_de(int(m)) for m in self.mascaras]
+
+    def unicos(self) -> "LoteJogos":
+        """Remove repetidos mantendo a ordem da primeira ocorrência."""
+        _valores, primeiros = np.unique(self.mascaras, return_index=True)
+        return LoteJogos(self.mascaras[np.sort(primeiros)])
+
+    def acertos(self, sorteio: Union[Jogo, int]) -> np.ndarray:
+        """Acertos de cada jogo do lote contra um sorteio (popcount vetorizado)."""
+        mascara = sorteio.mascara if isinstance(sorteio, Jogo) else int(sorteio)
+        return np.bitwise_count(self.mascaras & np.uint64(mascara))
+
+    def __len__(self) -> int:
+        return int(self.mascaras.shape[0])
+
+    def __iter__(self) -> Iterator[Jogo]:
+        return (Jogo(int(m)) for m in self.mascaras)
+
+    def __getitem__(self, indice: int) -> Jogo:
+        return Jogo(int(self.mascaras[indice]))
+
+    def __repr__(self) -> str:
+        return f"LoteJogos({len(self)} jogos)"
@@ -0,0 +1,228 @@
+# ponderacao.py
+from __future__ import annotations
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from sorteios import TOTAL_DEZENAS, HistoricoVazio, Sorteios, carregar_sorteios
+
+# =====================================================
+# Estratégias de ponderação das dezenas
+# =====================================================
+#
+# Cada estratégia mantém um vetor de pesos (índice 0 = dezena 1) calculado a
+# partir do histórico completo (sorteios.py) e atualizado sorteio a sorteio,
+# então uma janela de 500 concursos custa por requisição o mesmo que uma de 10.
+#
+# Especificação em texto (API e MEGASURP_PONDERACAO):
+#   "pool"             pool do cache do jogo (janela curta + piso; padrão)
+#   "janela:N"         aparições nos últimos N concursos + piso
+#   "decaimento:M"     aparições com peso 0,5^(idade/M) (meia-vida M concursos) + piso
+#   "inversa"          dezenas que menos saíram pesam mais ("atrasadas")
+#   "uniforme"         todas iguais
+
+# Padrão das páginas e da API quando a requisição não escolhe
+PONDERACAO_PADRAO = os.getenv("MEGASURP_PONDERACAO", "pool")
+
+# Peso mínimo de cada dezena (chance para todas, como o antigo range(1, N + 1))
+PISO = 1.0
+
+# Limite do parâmetro N/M (a especificação vem da requisição)
+MAX_PARAMETRO = 10_000
+
+# Estratégias mantidas em memória (por jogo + especificação)
+MAX_ESTRATEGIAS = 32
+
+
+class Estrategia(ABC):
+    """Base: sincroniza com o histórico (incremental ou, se mudou no meio, do zero)."""
+
+    usa_historico = True
+
+    def __init__(self, total_dezenas: int) -> None:
+        self.total_dezenas = total_dezenas
+        self._qtd = 0
+        self._ultimo: Optional[int] = None
+        self._origem: Optional[Sorteios] = None
+        self._pesos: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def pesos(self, sorteios: Sorteios) -> np.ndarray:
+        with self._lock:
+            if sorteios is not self._origem:
+                self._sincronizar(sorteios)
+                self._origem = sorteios
+                self._pesos = None
+            if self._pesos is None:
+                self._pesos = self._calcular_pesos()
+                self._pesos.flags.writeable = False
+            return self._pesos
+
+    def _sincronizar(self, sorteios: Sorteios) -> None:
+        qtd = self._qtd
+        continua = qtd > 0 and len(sorteios) >= qtd and int(sorteios.concurso[qtd - 1]) == self._ultimo
+        if continua:
+            for i in range(qtd, len(sorteios)):
+                self._ingerir(sorteios, i)
+        else:
+            self._reconstruir(sorteios)
+        self._qtd = len(sorteios)
+        self._ultimo = sorteios.ultimo_concurso
+
+    @abstractmethod
+    def _reconstruir(self, sorteios: Sorteios) -> None:
+        """Estado do zero a partir de todo o histórico."""
+
+    @abstractmethod
+    def _ingerir(self, sorteios: Sorteios, i: int) -> None:
+        """Acrescenta o sorteio i (incremental)."""
+
+    @abstractmethod
+    def _calcular_pesos(self) -> np.ndarray:
+        """Vetor de pesos a partir do estado atual."""
+
+
+def _presenca(dezenas: np.ndarray, total: int) -> np.ndarray:
+    """Matriz (n, total) com 1 onde a dezena saiu."""
+    presenca = np.zeros((dezenas.shape[0], total), dtype=np.float64)
+    np.put_along_axis(presenca, np.asarray(dezenas, dtype=np.int64) - 1, 1.0, axis=1)
+    return presenca
+
+
+class Janela(Estrategia):
+    def __init__(self, total_dezenas: int, tamanho: int) -> None:
+        super().__init__(total_dezenas)
+        self.tamanho = tamanho
+        self._contagem = np.zeros(total_dezenas, dtype=np.int64)
+
+    def _reconstruir(self, sorteios: Sorteios) -> None:
+        ultimos = np.asarray(sorteios.dezenas[-self.tamanho :], dtype=np.int64)
+        self._contagem = np.bincount(ultimos.ravel() - 1, minlength=self.total_dezenas)
+
+    def _ingerir(self, sorteios: Sorteios, i: int) -> None:
+        # Entra o sorteio i, sai o que ficou fora da janela
+        np.add.at(self._contagem, np.asarray(sorteios.dezenas[i], dtype=np.int64) - 1, 1)
+        if i >= self.tamanho:
+            np.subtract.at(
+                self._contagem, np.asarray(sorteios.dezenas[i - self.tamanho], dtype=np.int64) - 1, 1
+            )
+
+    def _calcular_pesos(self) -> np.ndarray:
+        return self._contagem + PISO
+
+
+class Decaimento(Estrategia):
+    def __init__(self, total_dezenas: int, meia_vida: float) -> None:
+        super().__init__(total_dezenas)
+        self.fator = 0.5 ** (1.0 / meia_vida)
+        self._acumulado = np.zeros(total_dezenas, dtype=np.float64)
+
+    def _reconstruir(self, sorteios: Sorteios) -> None:
+        qtd = len(sorteios)
+        idades = np.arange(qtd - 1, -1, -1, dtype=np.float64)
+        self._acumulado = (self.fator ** idades) @ _presenca(sorteios.dezenas, self.total_dezenas)
+
+    def _ingerir(self, sorteios: Sorteios, i: int) -> None:
+        self._acumulado *= self.fator
+        self._acumulado[np.asarray(sorteios.dezenas[i], dtype=np.int64) - 1] += 1.0
+
+    def _calcular_pesos(self) -> np.ndarray:
+        return self._acumulado + PISO
+
+
+class FrequenciaInversa(Estrategia):
+    def __init__(self, total_dezenas: int) -> None:
+        super().__init__(total_dezenas)
+        self._frequencia = np.zeros(total_dezenas, dtype=np.int64)
+
+    def _reconstruir(self, sorteios: Sorteios) -> None:
+        self._frequencia = np.bincount(
+            np.asarray(sorteios.dezenas, dtype=np.int64).ravel() - 1, minlength=self.total_dezenas
+        )
+
+    def _ingerir(self, sorteios: Sorteios, i: int) -> None:
+        np.add.at(self._frequencia, np.asarray(sorteios.dezenas[i], dtype=np.int64) - 1, 1)
+
+    def _calcular_pesos(self) -> np.ndarray:
+        # Média / frequência: a dezena média pesa 1, a menos sorteada pesa mais
+        frequencia = self._frequencia + PISO
+        return frequencia.mean() / frequencia
+
+
+class Uniforme(Estrategia):
+    usa_historico = False
+
+    def _reconstruir(self, sorteios: Sorteios) -> None:
+        pass
+
+    def _ingerir(self, sorteios: Sorteios, i: int) -> None:
+        pass
+
+    def _calcular_pesos(self) -> np.ndarray:
+        return np.ones(self.total_dezenas, dtype=np.float64)
+
+
+def interpretar(especificacao: str) -> Tuple[str, Optional[int]]:
+    """'janela:50' -> ('janela', 50). ValueError se inválida (inclusive se não for texto)."""
+    if not isinstance(especificacao, str):
+        raise ValueError(f"Ponderação deve ser texto, não {type(especificacao).__name__}.")
+    nome, _sep, parametro = especificacao.strip().lower().partition(":")
+    if nome in ("pool", "inversa", "uniforme"):
+        if parametro:
+            raise ValueError(f"Ponderação '{nome}' não aceita parâmetro.")
+        return nome, None
+    if nome in ("janela", "decaimento"):
+        try:
+            valor = int(parametro)
+        except ValueError:
+            raise ValueError(f"Ponderação '{nome}' exige um inteiro: {nome}:N") from None
+        if not (1 <= valor <= MAX_PARAMETRO):
+            raise ValueError(f"Parâmetro de '{nome}' deve ser entre 1 e {MAX_PARAMETRO}.")
+        return nome, valor
+    raise ValueError(f"Ponderação desconhecida: {especificacao}")
+
+
+def _criar(total_dezenas: int, nome: str, parametro: Optional[int]) -> Estrategia:
+    if nome == "janela":
+        return Janela(total_dezenas, parametro)
+    if nome == "decaimento":
+        return Decaimento(total_dezenas, parametro)
+    if nome == "inversa":
+        return FrequenciaInversa(total_dezenas)
+    return Uniforme(total_dezenas)
+
+
+_estrategias: "OrderedDict[Tuple[str, str, Optional[int]], Estrategia]" = OrderedDict()
+_estrategias_lock = threading.Lock()
+
+
+def pesos_para(jogo: str, especificacao: str) -> Optional[np.ndarray]:
+    """
+    Vetor de pesos (somente leitura) da estratégia para o jogo.
+    None para "pool" (quem chama usa o pool do cache).
+    RuntimeError se a estratégia precisa do histórico e ele está vazio.
+    """
+    nome, parametro = interpretar(especificacao)
+    if nome == "pool":
+        return None
+
+    chave = (jogo, nome, parametro)
+    with _estrategias_lock:
+        estrategia = _estrategias.get(chave)
+        if estrategia is None:
+            estrategia = _criar(TOTAL_DEZENAS[jogo], nome, parametro)
+            _estrategias[chave] = estrategia
+            if len(_estrategias) > MAX_ESTRATEGIAS:
+                _estrategias.popitem(last=False)
+        else:
+            _estrategias.move_to_end(chave)
+
+    sorteios = carregar_sorteios(jogo)
+    if estrategia.usa_historico and len(sorteios) == 0:
+        raise HistoricoVazio(jogo)
+    return estrategia.pesos(sorteios)
@@ -0,0 +1,85 @@
+# pool_cache.py
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+# TTL padrão (segundos) dos pools em memória.
+# Sobrescrever com env var MEGASURP_POOL_TTL (vale para todos os jogos).
+DEFAULT_TTL = float(os.getenv("MEGASURP_POOL_TTL", "1800"))
+
+# Resultados de fallback (cache/offline) expiram mais cedo para tentar a API de novo.
+DEFAULT_TTL_FALLBACK = float(os.getenv("MEGASURP_POOL_TTL_FALLBACK", "60"))
+
+
+class PoolCache(Generic[T]):
+    """
+    Cache em memória com TTL e stale-while-revalidate.
+
+    - Sem valor: carrega de forma síncrona (só a primeira requisição espera).
+    - Valor fresco: devolve direto, sem rede.
+    - Valor vencido: devolve o valor antigo e dispara UMA atualização em background.
+    """
+
+    def __init__(
+        self,
+        carregar: Callable[[], T],
+        ttl: float = DEFAULT_TTL,
+        ttl_de: Optional[Callable[[T], float]] = None,
+    ) -> None:
+        self._carregar = carregar
+        self._ttl = ttl
+        self._ttl_de = ttl_de
+        self._valor: Optional[T] = None
+        self._expira_em = 0.0
+        self._lock = threading.Lock()
+        self._carga_lock = threading.RLock()
+        self._atualizando = False
+
+    def obter(self) -> T:
+        with self._lock:
+            valor = self._valor
+            vencido = time.monotonic() >= self._expira_em
+            disparar = valor is not None and vencido and not self._atualizando
+            if disparar:
+                self._atualizando = True
+
+        if valor is None:
+            # Partida a frio: só uma thread busca, as demais esperam o resultado.
+            with self._carga_lock:
+                if self._valor is not None:
+                    return self._valor
+                return self.atualizar()
+
+        if disparar:
+            threading.Thread(target=self._atualizar_em_background, daemon=True).start()
+
+        return valor
+
+    def atualizar(self) -> T:
+        """Carrega agora (bloqueante) e guarda o resultado."""
+        with self._carga_lock:
+            valor = self._carregar()
+            ttl = self._ttl_de(valor) if self._ttl_de else self._ttl
+            with self._lock:
+                self._valor = valor
+                self._expira_em = time.monotonic() + ttl
+            return valor
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._expira_em = 0.0
+
+    def _atualizar_em_background(self) -> None:
+        try:
+            self.atualizar()
+        except Exception:
+            # Mantém o valor antigo; a próxima leitura tenta de novo.
+            pass
+        finally:
+            with self._lock:
+                self._atualizando = False
@@ -0,0 +1,174 @@
+# pool_compartilhado.py
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from cache_disco import Lideranca
+
+# =====================================================
+# Pool publicado uma vez e lido por todos os workers
+# =====================================================
+#
+# Com gunicorn, cada worker tinha o seu pool e ia à API por conta própria.
+# Agora um único worker (o líder, eleito por lock de arquivo) busca e publica
+# o pool num arquivo mapeado em memória; os outros só leem.
+#
+# Layout do arquivo (little-endian, tamanho fixo):
+#   0   magic       8s
+#   8   geracao     u64   ímpar = escrita em andamento (seqlock)
+#   16  expira_em   f64   time.time() em que o pool vence
+#   24  qtd_dezenas u32   posições usadas do vetor de contagens
+#   28  qtd_meta    u32   bytes do JSON com modo/fonte/mensagem
+#   32  meta        TAMANHO_META bytes
+#   ..  contagens   MAX_DEZENAS × u32 (quantas vezes cada dezena aparece no pool)
+#
+# O pool é publicado como contagem por dezena, de tamanho fixo seja qual for
+# a janela configurada: quem consome o pool só usa as contagens (pesos).
+# Por requisição o leitor só lê os 8 bytes da geração; o pool é decodificado
+# uma vez por geração em cada worker.
+
+ResultadoPool = Tuple[List[int], str, str, str]
+
+MAGIC = b"MSPOOL02"
+_CABECALHO = struct.Struct("<8sQdII")
+_GERACAO = struct.Struct("<Q")
+TAMANHO_META = 1024
+MAX_DEZENAS = 64
+_CONTAGENS = struct.Struct(f"<{MAX_DEZENAS}I")
+TAMANHO_ARQUIVO = _CABECALHO.size + TAMANHO_META + _CONTAGENS.size
+
+# Tentativas de leitura enquanto o líder escreve (a escrita leva microssegundos)
+TENTATIVAS_LEITURA = 100
+
+
+def _contar(pool: List[int]) -> List[int]:
+    contagens = [0] * MAX_DEZENAS
+    for dezena in pool:
+        if not 1 <= dezena <= MAX_DEZENAS:
+            raise ValueError(f"Dezena fora de 1..{MAX_DEZENAS} no pool: {dezena}")
+        contagens[dezena - 1] += 1
+    return contagens
+
+
+def _expandir(contagens: Tuple[int, ...], qtd_dezenas: int) -> List[int]:
+    return [d for d, c in enumerate(contagens[:qtd_dezenas], start=1) for _ in range(c)]
+
+
+class PoolCompartilhado:
+    def __init__(self, path: Path, ttl_de: Callable[[ResultadoPool], float]) -> None:
+        self.path = path
+        self._ttl_de = ttl_de
+        self._lideranca = Lideranca(path.with_name(path.name + ".lider"))
+        self._lock = threading.Lock()
+        self._mm: Optional[mmap.mmap] = None
+        # (geracao, expira_em, resultado) da última leitura deste processo
+        self._lido: Tuple[int, float, Optional[ResultadoPool]] = (0, 0.0, None)
+
+    def _mapa(self) -> mmap.mmap:
+        if self._mm is not None:
+            return self._mm
+
+        with self._lock:
+            if self._mm is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    if os.fstat(fd).st_size < TAMANHO_ARQUIVO:
+                        os.ftruncate(fd, TAMANHO_ARQUIVO)  # preenche com zeros (geração 0)
+                    self._mm = mmap.mmap(fd, TAMANHO_ARQUIVO)
+                finally:
+                    os.close(fd)
+            return self._mm
+
+    def sou_lider(self) -> bool:
+        return self._lideranca.tentar()
+
+    def publicar(self, resultado: ResultadoPool) -> None:
+        """Só o líder publica (um escritor por vez, então o seqlock basta)."""
+        pool, modo, fonte, mensagem = resultado
+        meta = json.dumps({"modo": modo, "fonte": fonte, "mensagem": mensagem}, ensure_ascii=False)
+        meta_bytes = meta.encode("utf-8")[:TAMANHO_META]
+        contagens = _contar(pool)
+        qtd_dezenas = max((d for d, c in enumerate(contagens, start=1) if c), default=0)
+        expira_em = time.time() + self._ttl_de(resultado)
+
+        mm = self._mapa()
+        with self._lock:
+            (geracao,) = _GERACAO.unpack_from(mm, 8)
+            geracao += geracao & 1  # escrita anterior interrompida: volta a par
+            _GERACAO.pack_into(mm, 8, geracao + 1)
+
+            inicio_meta = _CABECALHO.size
+            inicio_pool = inicio_meta + TAMANHO_META
+            mm[inicio_meta : inicio_meta + len(meta_bytes)] = meta_bytes
+            _CONTAGENS.pack_into(mm, inicio_pool, *contagens)
+            _CABECALHO.pack_into(mm, 0, MAGIC, geracao + 1, expira_em, qtd_dezenas, len(meta_bytes))
+
+            _GERACAO.pack_into(mm, 8, geracao + 2)
+
+    def ler(self) -> Optional[Tuple[float, ResultadoPool]]:
+        """(expira_em, resultado) publicado, ou None se nada foi publicado ainda."""
+        mm = self._mapa()
+        for _ in range(TENTATIVAS_LEITURA):
+            (geracao,) = _GERACAO.unpack_from(mm, 8)
+            if geracao == 0:
+                return None
+
+            geracao_lida, expira_lido, resultado_lido = self._lido
+            if geracao == geracao_lida and resultado_lido is not None:
+                return expira_lido, resultado_lido
+            if geracao & 1:
+                time.sleep(0)
+                continue
+
+            magic, _g, expira_em, qtd_dezenas, qtd_meta = _CABECALHO.unpack_from(mm, 0)
+            inicio_meta = _CABECALHO.size
+            inicio_pool = inicio_meta + TAMANHO_META
+            meta_bytes = mm[inicio_meta : inicio_meta + min(qtd_meta, TAMANHO_META)]
+            contagens = _CONTAGENS.unpack_from(mm, inicio_pool)
+
+            if _GERACAO.unpack_from(mm, 8)[0] != geracao:
+                continue  # o líder escreveu no meio da leitura
+            if magic != MAGIC:
+                return None
+
+            try:
+                meta = json.loads(meta_bytes)
+            except ValueError:
+                return None
+            resultado = (_expandir(contagens, qtd_dezenas), meta["modo"], meta["fonte"], meta["mensagem"])
+            self._lido = (geracao, expira_em, resultado)
+            return expira_em, resultado
+        return None
+
+    def ler_fresco(self) -> Optional[ResultadoPool]:
+        lido = self.ler()
+        if lido is None or time.time() >= lido[0]:
+            return None
+        return lido[1]
+
+    def carregar(
+        self,
+        buscar: Callable[[], ResultadoPool],
+        sem_rede: Callable[[], ResultadoPool],
+    ) -> ResultadoPool:
+        """
+        Carga do pool neste processo. Só o líder vai à API e publica; os demais
+        usam o último publicado (mesmo vencido) e, sem publicação, o cache em disco.
+        """
+        if self.sou_lider():
+            resultado = buscar()
+            self.publicar(resultado)
+            return resultado
+
+        lido = self.ler()
+        if lido is not None:
+            return lido[1]
+        return sem_rede()
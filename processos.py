@@ -0,0 +1,36 @@
+# processos.py
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# =====================================================
+# Pool de processos compartilhado (trabalho pesado de CPU)
+# =====================================================
+#
+# Um pool por processo, criado sob demanda. "spawn": o worker web tem threads
+# (atualizador, gravador do histórico) e fork com threads não é seguro.
+
+# Processos do pool (padrão: nº de CPUs)
+MAX_PROCESSOS = int(os.getenv("MEGASURP_PROCESSOS", str(os.cpu_count() or 1)))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def obter_executor() -> ProcessPoolExecutor:
+    global _executor, _executor_pid
+
+    pid = os.getpid()
+    with _executor_lock:
+        if _executor is None or _executor_pid != pid:
+            _executor = ProcessPoolExecutor(
+                max_workers=MAX_PROCESSOS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _executor_pid = pid
+        return _executor
@@ -0,0 +1,238 @@
+# restricoes.py
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from amostragem import (
+    TAMANHO_BLOCO,
+    ConjuntoMascaras,
+    FonteAleatoria,
+    blocos_unicos,
+    geradores_por_bloco,
+    tamanhos_dos_blocos,
+)
+
+# =====================================================
+# Geração com restrições (soma, ímpares, baixas, consecutivas)
+# =====================================================
+#
+# Em vez de sortear e descartar, conta por programação dinâmica quantos
+# complementos válidos existem a partir de cada estado e sorteia dezena a
+# dezena (1..N) com a probabilidade exata. Custo previsível: a tabela é
+# montada uma vez por (pesos, qtd_dezenas, restrições) e cada jogo custa N
+# passos vetorizados, mesmo com restrições apertadas.
+#
+# Estado antes da dezena i: (escolhidas, soma, ímpares, sequência atual).
+# Dimensões de restrições inativas têm tamanho 1. "Baixas" (dezenas até N/2)
+# não viram dimensão: ao passar da metade, as escolhidas até ali são as baixas.
+#
+# Distribuição: P(jogo) proporcional ao produto dos pesos das suas dezenas,
+# restrita aos jogos válidos (pesos iguais -> uniforme entre os válidos).
+# Não é a distribuição de amostragem.iterar_jogos (sorteio sucessivo sem
+# reposição): com pesos desiguais as chances por dezena diferem um pouco,
+# mesmo com restrições que não excluem nenhum jogo. Documentado na UI e na API.
+
+# Células (somando todas as camadas) acima disso: restrição ampla demais para a tabela
+MAX_CELULAS = int(os.getenv("MEGASURP_RESTRICOES_MAX_CELULAS", "8000000"))
+
+# Tabelas mantidas em memória (o pool muda pouco: a chave se repete)
+MAX_TABELAS = 8
+
+
+@dataclass(frozen=True)
+class Restricoes:
+    """Todas opcionais. baixas = quantas dezenas na primeira metade (1..N/2)."""
+
+    soma_min: Optional[int] = None
+    soma_max: Optional[int] = None
+    impares: Optional[int] = None
+    baixas: Optional[int] = None
+    max_consecutivos: Optional[int] = None
+
+    @property
+    def ativa(self) -> bool:
+        return any(
+            v is not None
+            for v in (self.soma_min, self.soma_max, self.impares, self.baixas, self.max_consecutivos)
+        )
+
+
+class _Tabela:
+    """Contagens ponderadas de complementos válidos, camada por dezena."""
+
+    def __init__(self, pesos: np.ndarray, qtd_dezenas: int, r: Restricoes) -> None:
+        total = pesos.shape[0]
+        k = qtd_dezenas
+        if k < 1 or k > total:
+            raise ValueError(f"Quantidade de dezenas deve ser entre 1 e {total}.")
+
+        maior_soma = sum(range(total - k + 1, total + 1))
+        self.usa_soma = r.soma_min is not None or r.soma_max is not None
+        soma_min = r.soma_min if r.soma_min is not None else 0
+        soma_max = min(r.soma_max if r.soma_max is not None else maior_soma, maior_soma)
+        self.usa_impares = r.impares is not None
+        self.usa_consecutivos = r.max_consecutivos is not None and r.max_consecutivos < k
+        self.metade = total // 2
+
+        if self.usa_impares and not (0 <= r.impares <= k):
+            raise ValueError(f"Ímpares deve ser entre 0 e {k}.")
+        if r.baixas is not None and not (0 <= r.baixas <= k):
+            raise ValueError(f"Baixas deve ser entre 0 e {k}.")
+        if r.max_consecutivos is not None and r.max_consecutivos < 1:
+            raise ValueError("Máximo de consecutivas deve ser ao menos 1.")
+        if (r.soma_min is not None and r.soma_min < 0) or (r.soma_max is not None and r.soma_max < 0):
+            raise ValueError("Soma mínima e máxima não podem ser negativas.")
+        if r.soma_min is not None and r.soma_max is not None and r.soma_min > r.soma_max:
+            raise ValueError("Soma mínima maior que a máxima.")
+
+        S = soma_max + 1 if self.usa_soma else 1
+        O = r.impares + 1 if self.usa_impares else 1
+        R = r.max_consecutivos + 1 if self.usa_consecutivos else 1
+        forma = (k + 1, S, O, R)
+        if int(np.prod(forma)) * (total + 1) > MAX_CELULAS:
+            raise ValueError("Restrições amplas demais para essa quantidade de dezenas.")
+
+        # Pesos normalizados (máx. 1) para as contagens não estourarem
+        pesos = np.asarray(pesos, dtype=np.float64)
+        if pesos.max() <= 0:
+            raise ValueError("Todos os pesos são zero.")
+        self.pesos = pesos / pesos.max()
+        self.total, self.k, self.forma = total, k, forma
+
+        # Camada final: exatamente k dezenas, soma na faixa, ímpares exatas
+        final = np.zeros(forma, dtype=np.float64)
+        if self.usa_soma:
+            final[k, soma_min : soma_max + 1] = 1.0
+        else:
+            final[k] = 1.0
+        if self.usa_impares:
+            final[:, :, : r.impares] = 0.0
+
+        # camadas[i] = complementos a partir da dezena i+1 (índice 0..total)
+        camadas = [final.astype(np.float32)]
+        atual = final
+        for dezena in range(total, 0, -1):
+            if r.baixas is not None and dezena == self.metade:
+                # Chegando à metade: só segue quem já tem exatamente `baixas` escolhidas
+                mascara = np.zeros(k + 1, dtype=bool)
+                mascara[r.baixas] = True
+                atual = atual * mascara[:, None, None, None]
+                camadas[-1] = atual.astype(np.float32)
+            atual = self._camada_anterior(atual, dezena)
+            camadas.append(atual.astype(np.float32))
+        camadas.reverse()
+        self.camadas = camadas  # camadas[i]: estado antes da dezena i+1
+
+        if self.camadas[0][0, 0, 0, 0] <= 0:
+            raise ValueError("Nenhum jogo satisfaz as restrições.")
+
+    def _deslocamentos(self, dezena: int) -> Tuple[int, int, int]:
+        return (
+            dezena if self.usa_soma else 0,
+            dezena & 1 if self.usa_impares else 0,
+            1 if self.usa_consecutivos else 0,
+        )
+
+    def _camada_anterior(self, seguinte: np.ndarray, dezena: int) -> np.ndarray:
+        ds, do, dr = self._deslocamentos(dezena)
+        k1, S, O, R = self.forma
+
+        # Não escolher: sequência volta a 0
+        anterior = np.broadcast_to(seguinte[:, :, :, :1], self.forma).copy()
+
+        # Escolher: (c+1, s+dezena, o+ímpar, r+1)
+        peso = self.pesos[dezena - 1]
+        if peso > 0 and S - ds > 0 and O - do > 0 and R - dr > 0:
+            anterior[: k1 - 1, : S - ds, : O - do, : R - dr] += (
+                peso * seguinte[1:, ds:, do:, dr:]
+            )
+        return anterior
+
+    def sortear(self, n: int, rng: np.random.Generator) -> np.ndarray:
+        """n jogos (n, k) ordenados, cada um com a probabilidade exata."""
+        c = np.zeros(n, dtype=np.int64)
+        s = np.zeros(n, dtype=np.int64)
+        o = np.zeros(n, dtype=np.int64)
+        r = np.zeros(n, dtype=np.int64)
+        jogos = np.zeros((n, self.k), dtype=np.uint8)
+        linhas = np.arange(n)
+
+        for dezena in range(1, self.total + 1):
+            seguinte = self.camadas[dezena]
+            ds, do, dr = self._deslocamentos(dezena)
+
+            # Índices de "escolher" fora da tabela valem 0
+            c1, s1, o1, r1 = c + 1, s + ds, o + do, r + dr
+            valido = (c1 < self.forma[0]) & (s1 < self.forma[1]) & (o1 < self.forma[2]) & (r1 < self.forma[3])
+            f_escolher = np.zeros(n, dtype=np.float64)
+            f_escolher[valido] = seguinte[c1[valido], s1[valido], o1[valido], r1[valido]]
+            f_escolher *= self.pesos[dezena - 1]
+            f_pular = seguinte[c, s, o, 0].astype(np.float64)
+
+            # Razão calculada na mesma camada: sem pular possível, p = 1 exato
+            with np.errstate(divide="ignore", invalid="ignore"):
+                p = np.where(f_escolher > 0, f_escolher / (f_escolher + f_pular), 0.0)
+            escolhe = rng.random(n) < p
+
+            jogos[linhas[escolhe], c[escolhe]] = dezena
+            c = np.where(escolhe, c1, c)
+            s = np.where(escolhe, s1, s)
+            o = np.where(escolhe, o1, o)
+            r = np.where(escolhe, r1, 0)
+        return jogos
+
+
+_tabelas: "OrderedDict[tuple, _Tabela]" = OrderedDict()
+_tabelas_lock = threading.Lock()
+
+
+def _obter_tabela(pesos: np.ndarray, qtd_dezenas: int, restricoes: Restricoes) -> _Tabela:
+    pesos = np.ascontiguousarray(pesos, dtype=np.float64)
+    chave = (pesos.tobytes(), qtd_dezenas, restricoes)
+    with _tabelas_lock:
+        tabela = _tabelas.get(chave)
+        if tabela is not None:
+            _tabelas.move_to_end(chave)
+            return tabela
+
+    tabela = _Tabela(pesos, qtd_dezenas, restricoes)
+    with _tabelas_lock:
+        _tabelas[chave] = tabela
+        if len(_tabelas) > MAX_TABELAS:
+            _tabelas.popitem(last=False)
+    return tabela
+
+
+def iterar_jogos_restritos(
+    pesos: np.ndarray,
+    qtd_jogos: int,
+    qtd_dezenas: int,
+    restricoes: Restricoes,
+    rng: FonteAleatoria = None,
+    tamanho_bloco: int = TAMANHO_BLOCO,
+    sem_repeticao: bool = False,
+    excluir: Optional[ConjuntoMascaras] = None,
+) -> Iterator[np.ndarray]:
+    """Mesmo contrato de amostragem.iterar_jogos, só com jogos que satisfazem `restricoes`."""
+    tabela = _obter_tabela(pesos, qtd_dezenas, restricoes)  # valida já na chamada
+    gerador = geradores_por_bloco(rng)
+
+    if sem_repeticao or excluir is not None:
+        return blocos_unicos(lambda i, n: tabela.sortear(n, gerador(i)), qtd_jogos, tamanho_bloco, excluir)
+    return _blocos(tabela, qtd_jogos, gerador, tamanho_bloco)
+
+
+def _blocos(
+    tabela: _Tabela,
+    qtd_jogos: int,
+    gerador: Callable[[int], np.random.Generator],
+    tamanho_bloco: int,
+) -> Iterator[np.ndarray]:
+    for i, n in enumerate(tamanhos_dos_blocos(qtd_jogos, tamanho_bloco)):
+        yield tabela.sortear(n, gerador(i))
@@ -0,0 +1,345 @@
+# sorteios.py
+from __future__ import annotations
+
+import argparse
+import os
+import struct
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import core
+import core_lotofacil
+from cache_disco import escrever_atomico, trava_arquivo
+from jogos import LoteJogos
+from upstream import buscar_em_paralelo
+
+# =====================================================
+# Histórico completo de sorteios (colunar, mapeado em memória)
+# =====================================================
+#
+# Um arquivo por jogo, ao lado do cache do jogo (sorteios_<jogo>.bin):
+#   0    magic         8s
+#   8    qtd           u32   nº de sorteios
+#   12   qtd_dezenas   u32   dezenas por sorteio (6 ou 15)
+#   16   reservado     48 bytes
+#   64   concurso      u32[qtd]       (ordem crescente)
+#   ..   data          u32[qtd]       AAAAMMDD (0 se a API não informou)
+#   ..   mascara       u64[qtd]       bit n-1 = dezena n
+#   ..   dezenas       u8[qtd, qtd_dezenas]   ordenadas
+#
+# O arquivo é regravado inteiro (temporário + os.replace) a cada lote do
+# backfill: ~25 bytes por sorteio, então o histórico todo cabe em ~100 KB.
+# Os workers mapeiam o arquivo (np.memmap) e as colunas são views, sem cópia.
+
+MAGIC = b"MSSORT01"
+_CABECALHO = struct.Struct("<8sII48x")
+
+# Concursos baixados por vez no backfill (cada lote é persistido: retomada)
+LOTE_BACKFILL = int(os.getenv("MEGASURP_BACKFILL_LOTE", "100"))
+
+
+@dataclass(frozen=True)
+class ConfigJogo:
+    qtd_dezenas: int
+    path: Path
+    obter_ultimo: Callable[[], int]
+    obter_concurso: Callable[[int], dict]
+    concurso_em_cache: Callable[[], Optional[int]]
+
+
+JOGOS: Dict[str, ConfigJogo] = {
+    "megasena": ConfigJogo(
+        6,
+        core.DEFAULT_CACHE_PATH.with_name("sorteios_megasena.bin"),
+        core.obter_ultimo_concurso_alt,
+        core.obter_concurso_alt,
+        core.concurso_em_cache,
+    ),
+    "lotofacil": ConfigJogo(
+        15,
+        core_lotofacil.DEFAULT_CACHE_PATH.with_name("sorteios_lotofacil.bin"),
+        core_lotofacil.obter_ultimo_concurso_alt,
+        core_lotofacil.obter_concurso_alt,
+        core_lotofacil.concurso_em_cache,
+    ),
+}
+
+# Dezenas possíveis por jogo (1..N)
+TOTAL_DEZENAS: Dict[str, int] = {
+    "megasena": core.TOTAL_DEZENAS,
+    "lotofacil": core_lotofacil.TOTAL_DEZENAS,
+}
+
+
+class HistoricoVazio(RuntimeError):
+    """Nenhum sorteio baixado ainda para o jogo (a API responde 503)."""
+
+    def __init__(self, jogo: str) -> None:
+        super().__init__(f"Histórico de sorteios de {jogo} vazio. Rode o backfill: python sorteios.py {jogo}")
+
+
+class Sorteios:
+    """Colunas do histórico de um jogo (views sobre o arquivo mapeado)."""
+
+    __slots__ = ("concurso", "data", "mascaras", "dezenas")
+
+    def __init__(
+        self,
+        concurso: np.ndarray,
+        data: np.ndarray,
+        mascaras: np.ndarray,
+        dezenas: np.ndarray,
+    ) -> None:
+        self.concurso = concurso
+        self.data = data
+        self.mascaras = mascaras
+        self.dezenas = dezenas
+
+    @classmethod
+    def vazio(cls, qtd_dezenas: int) -> "Sorteios":
+        return cls(
+            np.empty(0, dtype=np.uint32),
+            np.empty(0, dtype=np.uint32),
+            np.empty(0, dtype=np.uint64),
+            np.empty((0, qtd_dezenas), dtype=np.uint8),
+        )
+
+    @property
+    def lote(self) -> LoteJogos:
+        return LoteJogos(self.mascaras)
+
+    @property
+    def ultimo_concurso(self) -> Optional[int]:
+        return int(self.concurso[-1]) if len(self) else None
+
+    def indice_de(self, concurso: int) -> Optional[int]:
+        i = int(np.searchsorted(self.concurso, concurso))
+        if i < len(self) and int(self.concurso[i]) == concurso:
+            return i
+        return None
+
+    def __len__(self) -> int:
+        return int(self.concurso.shape[0])
+
+    def __repr__(self) -> str:
+        return f"Sorteios({len(self)} concursos)"
+
+
+# =====================================================
+# Arquivo colunar
+# =====================================================
+
+def _offsets(qtd: int) -> Tuple[int, int, int, int]:
+    concurso = _CABECALHO.size
+    data = concurso + 4 * qtd
+    mascara = data + 4 * qtd  # 64 + 8·qtd: alinhado em 8
+    dezenas = mascara + 8 * qtd
+    return concurso, data, mascara, dezenas
+
+
+def _mapear(path: Path, qtd_dezenas: int) -> Sorteios:
+    if not path.exists() or path.stat().st_size < _CABECALHO.size:
+        return Sorteios.vazio(qtd_dezenas)
+
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, qtd, k = _CABECALHO.unpack_from(mm, 0)
+    if magic != MAGIC or k != qtd_dezenas:
+        raise ValueError(f"Arquivo de sorteios inválido: {path}")
+
+    o_concurso, o_data, o_mascara, o_dezenas = _offsets(qtd)
+    return Sorteios(
+        mm[o_concurso:o_data].view(np.uint32),
+        mm[o_data:o_mascara].view(np.uint32),
+        mm[o_mascara:o_dezenas].view(np.uint64),
+        mm[o_dezenas : o_dezenas + qtd * k].reshape(qtd, k),
+    )
+
+
+def _gravar(path: Path, sorteios: Sorteios) -> None:
+    qtd, k = sorteios.dezenas.shape
+    partes = [
+        _CABECALHO.pack(MAGIC, qtd, k),
+        sorteios.concurso.astype("<u4").tobytes(),
+        sorteios.data.astype("<u4").tobytes(),
+        sorteios.mascaras.astype("<u8").tobytes(),
+        np.ascontiguousarray(sorteios.dezenas, dtype=np.uint8).tobytes(),
+    ]
+    escrever_atomico(path, b"".join(partes))
+
+
+class ArquivoSorteios:
+    """Mapeia o arquivo uma vez e remapeia só quando ele muda (mtime/tamanho/inode)."""
+
+    def __init__(self, config: ConfigJogo) -> None:
+        self.config = config
+        self._lock = threading.Lock()
+        self._assinatura: Optional[Tuple[int, int, int]] = None
+        self._sorteios: Optional[Sorteios] = None
+
+    def obter(self) -> Sorteios:
+        path = self.config.path
+        try:
+            st = os.stat(path)
+            assinatura = (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            assinatura = None
+
+        with self._lock:
+            if self._sorteios is None or assinatura != self._assinatura:
+                self._sorteios = _mapear(path, self.config.qtd_dezenas)
+                self._assinatura = assinatura
+            return self._sorteios
+
+
+_ARQUIVOS: Dict[str, ArquivoSorteios] = {jogo: ArquivoSorteios(cfg) for jogo, cfg in JOGOS.items()}
+
+
+def carregar_sorteios(jogo: str) -> Sorteios:
+    """Histórico completo de `jogo` ("megasena" | "lotofacil"), mapeado em memória."""
+    return _ARQUIVOS[jogo].obter()
+
+
+# =====================================================
+# Backfill (com retomada)
+# =====================================================
+
+def _data_aaaammdd(valor: Optional[str]) -> int:
+    if not valor:
+        return 0
+    for formato in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return int(datetime.strptime(str(valor)[:10], formato).strftime("%Y%m%d"))
+        except ValueError:
+            continue
+    return 0
+
+
+def _linha_do_concurso(dados: Optional[dict], qtd_dezenas: int) -> Optional[Tuple[int, int, List[int]]]:
+    if not dados:
+        return None
+    try:
+        dezenas = sorted(int(d) for d in dados.get("listaDezenas") or [])
+        numero = int(dados["numero"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if len(dezenas) != qtd_dezenas:
+        return None
+    return numero, _data_aaaammdd(dados.get("dataApuracao")), dezenas
+
+
+def _mesclar(atual: Sorteios, novos: Iterable[Tuple[int, int, List[int]]]) -> Sorteios:
+    novos = sorted(novos)
+    if not novos:
+        return atual
+
+    concurso = np.array([n for n, _d, _z in novos], dtype=np.uint32)
+    data = np.array([d for _n, d, _z in novos], dtype=np.uint32)
+    dezenas = np.array([z for _n, _d, z in novos], dtype=np.uint8)
+
+    concurso = np.concatenate([np.asarray(atual.concurso), concurso])
+    ordem = np.argsort(concurso, kind="stable")
+    dezenas = np.concatenate([np.asarray(atual.dezenas), dezenas])[ordem]
+    return Sorteios(
+        concurso[ordem],
+        np.concatenate([np.asarray(atual.data), data])[ordem],
+        LoteJogos.de_matriz(dezenas).mascaras,
+        dezenas,
+    )
+
+
+def backfill(
+    jogo: str,
+    ate: Optional[int] = None,
+    progresso: Optional[Callable[[int, int], None]] = None,
+    desde: int = 1,
+) -> int:
+    """
+    Baixa os concursos que faltam (desde..ate; padrão: 1..último) e persiste a
+    cada lote, então uma execução interrompida continua de onde parou.
+    Retorna quantos concursos foram adicionados.
+    """
+    config = JOGOS[jogo]
+    path = config.path
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    def buscar(numero: int) -> Optional[dict]:
+        # Falha isolada não derruba o lote: o concurso fica para a próxima execução
+        try:
+            return config.obter_concurso(numero)
+        except Exception:
+            return None
+
+    with trava_arquivo(path.with_name(path.name + ".lock"), bloquear=False) as travado:
+        if not travado:
+            raise RuntimeError(f"Backfill de {jogo} já em andamento em outro processo.")
+
+        ultimo = ate if ate is not None else config.obter_ultimo()
+        atual = _mapear(path, config.qtd_dezenas)
+        presentes = set(np.asarray(atual.concurso).tolist())
+        faltantes = [n for n in range(desde, ultimo + 1) if n not in presentes]
+
+        adicionados = 0
+        for i in range(0, len(faltantes), LOTE_BACKFILL):
+            lote = faltantes[i : i + LOTE_BACKFILL]
+            resultados = buscar_em_paralelo(buscar, lote)
+            linhas = [
+                linha
+                for linha in (_linha_do_concurso(d, config.qtd_dezenas) for d in resultados)
+                if linha is not None
+            ]
+            if linhas:
+                atual = _mesclar(atual, linhas)
+                _gravar(path, atual)
+                adicionados += len(linhas)
+            if progresso:
+                progresso(min(i + LOTE_BACKFILL, len(faltantes)), len(faltantes))
+        return adicionados
+
+
+def completar(jogo: str) -> int:
+    """
+    Acrescenta ao histórico os concursos que o cache do jogo já conhece
+    (chamado pelo atualizador). Não faz o backfill inicial: sem histórico, nada.
+    """
+    sorteios = carregar_sorteios(jogo)
+    ultimo = JOGOS[jogo].concurso_em_cache()
+    if not len(sorteios) or ultimo is None or ultimo <= sorteios.ultimo_concurso:
+        return 0
+    try:
+        return backfill(jogo, ate=ultimo, desde=sorteios.ultimo_concurso + 1)
+    except RuntimeError:
+        return 0  # outro processo já está gravando
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Histórico completo de sorteios (backfill).")
+    parser.add_argument("jogos", nargs="*", help="megasena e/ou lotofacil (padrão: ambos)")
+    parser.add_argument("--ate", type=int, default=None, help="último concurso a baixar")
+    args = parser.parse_args(argv)
+
+    for jogo in args.jogos:
+        if jogo not in JOGOS:
+            parser.error(f"jogo inválido: {jogo}")
+
+    for jogo in args.jogos or list(JOGOS):
+        def progresso(feitos: int, total: int, jogo: str = jogo) -> None:
+            print(f"\r{jogo}: {feitos}/{total}", end="", file=sys.stderr, flush=True)
+
+        adicionados = backfill(jogo, args.ate, progresso)
+        sorteios = carregar_sorteios(jogo)
+        print(
+            f"\n{jogo}: +{adicionados} concursos, {len(sorteios)} no total "
+            f"(último: {sorteios.ultimo_concurso}) em {JOGOS[jogo].path}",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
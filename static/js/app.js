@@ -1,108 +1,420 @@
 /* ================================
-   Histórico local (localStorage)
+   Histórico local (IndexedDB; localStorage como fallback)
 ================================ */
+// Um object store por jogo, chave autoincremento: gravar é só um add (sem
+// reler o histórico) e a listagem anda por páginas, do mais recente ao mais
+// antigo. Só a página visível fica no DOM.
+const DB_NOME = "megasurpresinhas";
+const DB_VERSAO = 1;
+const JOGOS_HISTORICO = ["mega", "lotofacil"];
+const HISTORICO_POR_PAGINA = 20;
+
 function getJogoAtual() {
   const el = document.getElementById("historico-local");
   const jogo = el?.dataset?.jogo || "mega";
   return jogo;
 }
 
-function getStorageKey() {
-  const jogo = getJogoAtual();
+function getStorageKey(jogo = getJogoAtual()) {
   return `megasurpresinhas_${jogo}_historico`;
 }
 
-function getHistorico() {
+function nomeStore(jogo) {
+  return `historico_${jogo}`;
+}
+
+function requisicao(req) {
+  return new Promise((resolve, reject) => {
+    req.onsuccess = () => resolve(req.result);
+    req.onerror = () => reject(req.error);
+  });
+}
+
+function transacaoConcluida(tx) {
+  return new Promise((resolve, reject) => {
+    tx.oncomplete = () => resolve();
+    tx.onerror = () => reject(tx.error);
+    tx.onabort = () => reject(tx.error);
+  });
+}
+
+// Histórico antigo (array inteiro no localStorage) vai para o IndexedDB uma vez
+async function migrarLocalStorage(db) {
+  for (const jogo of JOGOS_HISTORICO) {
+    let antigos;
+    try {
+      antigos = JSON.parse(localStorage.getItem(getStorageKey(jogo))) || [];
+    } catch {
+      continue;
+    }
+    if (!antigos.length) continue;
+
+    const tx = db.transaction(nomeStore(jogo), "readwrite");
+    const store = tx.objectStore(nomeStore(jogo));
+    // O array é do mais recente ao mais antigo; as chaves crescem com a data
+    antigos.slice().reverse().forEach((item) => store.add({ ...item, jogo }));
+    await transacaoConcluida(tx);
+    localStorage.removeItem(getStorageKey(jogo));
+  }
+  return db;
+}
+
+let dbPromise = null;
+
+function abrirDb() {
+  if (!dbPromise) {
+    dbPromise = new Promise((resolve, reject) => {
+      if (!window.indexedDB) {
+        reject(new Error("IndexedDB indisponível"));
+        return;
+      }
+      const req = indexedDB.open(DB_NOME, DB_VERSAO);
+      req.onupgradeneeded = () => {
+        JOGOS_HISTORICO.forEach((jogo) => {
+          if (!req.result.objectStoreNames.contains(nomeStore(jogo))) {
+            req.result.createObjectStore(nomeStore(jogo), { autoIncrement: true });
+          }
+        });
+      };
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    }).then(migrarLocalStorage);
+  }
+  return dbPromise;
+}
+
+// ---- Fallback (navegação privada antiga etc.): o array no localStorage ----
+
+function getHistoricoLocalStorage(jogo) {
   try {
-    return JSON.parse(localStorage.getItem(getStorageKey())) || [];
+    return JSON.parse(localStorage.getItem(getStorageKey(jogo))) || [];
   } catch {
     return [];
   }
 }
 
-function salvarHistorico(item) {
-  const historico = getHistorico();
-  historico.unshift(item);
-  localStorage.setItem(getStorageKey(), JSON.stringify(historico));
+// ---- Operações (mesmo contrato com IndexedDB ou localStorage) ----
+
+async function adicionarHistorico(jogo, item) {
+  try {
+    const db = await abrirDb();
+    const tx = db.transaction(nomeStore(jogo), "readwrite");
+    tx.objectStore(nomeStore(jogo)).add(item);
+    await transacaoConcluida(tx);
+  } catch {
+    const historico = getHistoricoLocalStorage(jogo);
+    historico.unshift(item);
+    localStorage.setItem(getStorageKey(jogo), JSON.stringify(historico));
+  }
+}
+
+// Página do mais recente ao mais antigo, depois de `cursor` (null = início).
+// Retorna { itens, proximo, total }; proximo null = fim.
+async function lerPaginaHistorico(jogo, cursor, limite) {
+  let db;
+  try {
+    db = await abrirDb();
+  } catch {
+    const historico = getHistoricoLocalStorage(jogo);
+    const inicio = cursor || 0;
+    const fim = inicio + limite;
+    return {
+      itens: historico.slice(inicio, fim),
+      proximo: fim < historico.length ? fim : null,
+      total: historico.length,
+    };
+  }
+
+  // count e cursor na mesma transação, sem await entre eles (ela fecharia)
+  const store = db.transaction(nomeStore(jogo)).objectStore(nomeStore(jogo));
+  const faixa = cursor === null ? null : IDBKeyRange.upperBound(cursor, true);
+  const total = requisicao(store.count());
+  const pagina = new Promise((resolve, reject) => {
+    const itens = [];
+    let ultimaChave = null;
+    const req = store.openCursor(faixa, "prev");
+    req.onerror = () => reject(req.error);
+    req.onsuccess = () => {
+      const c = req.result;
+      if (!c) {
+        resolve({ itens, proximo: null });
+        return;
+      }
+      if (itens.length === limite) {
+        resolve({ itens, proximo: ultimaChave });
+        return;
+      }
+      itens.push(c.value);
+      ultimaChave = c.primaryKey;
+      c.continue();
+    };
+  });
+
+  const [qtd, { itens, proximo }] = await Promise.all([total, pagina]);
+  return { itens, proximo, total: qtd };
 }
 
-function limparHistorico() {
-  localStorage.removeItem(getStorageKey());
+async function limparHistorico(jogo = getJogoAtual()) {
+  localStorage.removeItem(getStorageKey(jogo));
+  try {
+    const db = await abrirDb();
+    const tx = db.transaction(nomeStore(jogo), "readwrite");
+    tx.objectStore(nomeStore(jogo)).clear();
+    await transacaoConcluida(tx);
+  } catch {
+    // só havia o localStorage
+  }
 }
 
-function handleLimparHistorico() {
+// Gravações pendentes: a renderização espera por elas (o template chama
+// salvarHistorico e renderHistorico em seguida, sem await)
+let gravacoes = Promise.resolve();
+
+function salvarHistorico(item) {
+  const jogo = getJogoAtual();
+  gravacoes = gravacoes
+    .then(() => adicionarHistorico(jogo, item))
+    .catch((e) => console.warn("Histórico: falha ao salvar.", e));
+  return gravacoes;
+}
+
+async function handleLimparHistorico() {
   const ok = confirm(
     "Tem certeza que deseja apagar todo o histórico gerado deste dispositivo?\n\nEssa ação não pode ser desfeita."
   );
   if (!ok) return;
 
-  limparHistorico();
-  renderHistorico();
+  await gravacoes;
+  await limparHistorico();
+  await renderHistorico();
   alert("Histórico limpo com sucesso.");
 }
 
-function renderHistorico() {
+// ---- Renderização paginada ----
+
+// cursores[i] = cursor da página i (a 0 começa no mais recente)
+const paginacaoHistorico = { cursores: [null], pagina: 0 };
+
+function htmlItemHistorico(item, jogoAtual) {
+  const jogosHtml = item.jogos.map((jogo, idx) => {
+    // ===== Lotofácil: grade 5×N =====
+    if (jogoAtual === "lotofacil") {
+      const nums = jogo
+        .map(
+          (n) =>
+            `<div class="lotofacil-num">${String(n).padStart(2, "0")}</div>`
+        )
+        .join("");
+
+      return `
+        <div style="margin-top:6px;">
+          <b>${idx + 1})</b>
+          <div class="lotofacil-grid">
+            ${nums}
+          </div>
+        </div>
+      `;
+    }
+
+    // ===== Mega-Sena (layout atual) =====
+    return `
+      <div>
+        ${idx + 1}) ${jogo
+          .map((n) => String(n).padStart(2, "0"))
+          .join(" - ")}
+      </div>
+    `;
+  }).join("");
+
+  return `
+    <div><b>${item.data}</b></div>
+    <div class="small">Modo: ${item.modo} | Fonte: ${item.fonte}</div>
+    <div style="margin-top:6px;">
+      ${jogosHtml}
+    </div>
+  `;
+}
+
+async function renderPaginaHistorico() {
   const container = document.getElementById("historico-local");
   if (!container) return;
 
-  const historico = getHistorico();
+  const jogoAtual = getJogoAtual();
+  const { pagina, cursores } = paginacaoHistorico;
+  const { itens, proximo, total } = await lerPaginaHistorico(
+    jogoAtual,
+    cursores[pagina],
+    HISTORICO_POR_PAGINA
+  );
+  cursores[pagina + 1] = proximo;
 
-  if (!historico.length) {
+  if (!total) {
     container.innerHTML =
       "<span class='small'>Nenhum histórico salvo neste dispositivo.</span>";
     return;
   }
 
-  const jogoAtual = getJogoAtual();
-
-  container.innerHTML = "";
-
-  historico.forEach((item) => {
+  const fragmento = document.createDocumentFragment();
+  itens.forEach((item) => {
     const div = document.createElement("div");
     div.className = "historico-item";
+    div.innerHTML = htmlItemHistorico(item, jogoAtual);
+    fragmento.appendChild(div);
+  });
 
-    const jogosHtml = item.jogos.map((jogo, idx) => {
-      // ===== Lotofácil: grade 5×N =====
-      if (jogoAtual === "lotofacil") {
-        const nums = jogo
-          .map(
-            (n) =>
-              `<div class="lotofacil-num">${String(n).padStart(2, "0")}</div>`
-          )
-          .join("");
-
-        return `
-          <div style="margin-top:6px;">
-            <b>${idx + 1})</b>
-            <div class="lotofacil-grid">
-              ${nums}
-            </div>
-          </div>
-        `;
-      }
+  const paginas = Math.ceil(total / HISTORICO_POR_PAGINA);
+  if (paginas > 1) {
+    const nav = document.createElement("div");
+    nav.className = "small";
+    nav.style.cssText = "display:flex; gap:8px; align-items:center;";
+    nav.innerHTML = `
+      <button type="button" data-pagina="-1" ${pagina === 0 ? "disabled" : ""}>‹ Mais recentes</button>
+      <span>Página ${pagina + 1} de ${paginas} (${total} registros)</span>
+      <button type="button" data-pagina="1" ${proximo === null ? "disabled" : ""}>Anteriores ›</button>
+    `;
+    nav.addEventListener("click", (event) => {
+      const passo = parseInt(event.target?.dataset?.pagina || "0", 10);
+      if (!passo) return;
+      paginacaoHistorico.pagina = Math.max(0, pagina + passo);
+      renderPaginaHistorico();
+    });
+    fragmento.appendChild(nav);
+  }
 
-      // ===== Mega-Sena (layout atual) =====
-      return `
-        <div>
-          ${idx + 1}) ${jogo
-            .map((n) => String(n).padStart(2, "0"))
-            .join(" - ")}
-        </div>
-      `;
-    }).join("");
+  container.replaceChildren(fragmento);
+}
 
-    div.innerHTML = `
-      <div><b>${item.data}</b></div>
-      <div class="small">Modo: ${item.modo} | Fonte: ${item.fonte}</div>
-      <div style="margin-top:6px;">
-        ${jogosHtml}
-      </div>
-    `;
+// Volta para a primeira página (mais recentes), depois das gravações pendentes
+async function renderHistorico() {
+  await gravacoes;
+  paginacaoHistorico.cursores = [null];
+  paginacaoHistorico.pagina = 0;
+  try {
+    await renderPaginaHistorico();
+  } catch (e) {
+    console.warn("Histórico: falha ao ler.", e);
+  }
+}
+
+/* ================================
+   Geração no aparelho (snapshot do pool)
+================================ */
+// Casos simples (sem filtros e sem "nunca repetir" do histórico do servidor)
+// são sorteados aqui, com os pesos de /api/<jogo>/pool: mesma distribuição do
+// servidor, sem ida e volta e funcionando offline (o service worker guarda o pool).
+
+const MAX_TENTATIVAS_LOTE = 1000;
 
-    container.appendChild(div);
+async function carregarPool(url) {
+  const resp = await fetch(url, { headers: { Accept: "application/json" } });
+  if (!resp.ok) throw new Error(`pool indisponível (${resp.status})`);
+  return resp.json();
+}
+
+function aleatorioAberto() {
+  // (0, 1]: nunca 0, para o log abaixo
+  const buf = new Uint32Array(1);
+  crypto.getRandomValues(buf);
+  return (buf[0] + 1) / 4294967296;
+}
+
+// Sorteio ponderado sem reposição ("exponential race"): chave E/peso, ficam as k menores
+function sortearJogo(pesos, qtdDezenas) {
+  const chaves = [];
+  pesos.forEach((peso, i) => {
+    if (peso > 0) chaves.push([-Math.log(aleatorioAberto()) / peso, i + 1]);
+  });
+  if (chaves.length < qtdDezenas) throw new Error("pool pequeno demais");
+  chaves.sort((a, b) => a[0] - b[0]);
+  return chaves.slice(0, qtdDezenas).map((c) => c[1]).sort((a, b) => a - b);
+}
+
+function gerarJogosLocais(pool, qtdJogos, qtdDezenas, semRepeticao) {
+  const jogos = [];
+  const vistos = new Set();
+  let tentativas = 0;
+  while (jogos.length < qtdJogos) {
+    if (++tentativas > MAX_TENTATIVAS_LOTE) throw new Error("sem jogos distintos suficientes");
+    const jogo = sortearJogo(pool.pesos, qtdDezenas);
+    const chave = jogo.join(",");
+    if (semRepeticao && vistos.has(chave)) continue;
+    vistos.add(chave);
+    jogos.push(jogo);
+  }
+  return jogos;
+}
+
+function podeGerarLocal(form) {
+  if (!window.crypto?.getRandomValues) return false;
+  if (form.elements.repeticao?.value === "historico") return false;
+  const filtros = form.querySelectorAll("details input");
+  return Array.from(filtros).every((input) => input.value === "");
+}
+
+function renderResultadoLocal(jogos, pool) {
+  const box = document.getElementById("resultado-local");
+  if (!box) return;
+
+  const linhas = jogos.map((jogo, idx) => {
+    const numeros = jogo.map((n) => String(n).padStart(2, "0")).join(" - ");
+    const quebra = (idx + 1) % 3 === 0 && idx + 1 < jogos.length
+      ? `<div class="quebra-grupo"></div>`
+      : "";
+    return `<div class="linha-jogo">${idx + 1}) ${numeros}</div>${quebra}`;
+  }).join("");
+
+  box.innerHTML = `
+    <b>Resultado gerado:</b>
+    <div class="resultado-lista">${linhas}</div>
+    <div class="small">Gerado neste dispositivo · concurso ${pool.concurso ?? "—"} · ${pool.modo} (${pool.fonte})</div>
+  `;
+  box.hidden = false;
+}
+
+async function gerarNoAparelho(form) {
+  const pool = await carregarPool(form.dataset.pool);
+  const qtdJogos = parseInt(form.elements.qtd_surpresinhas.value, 10);
+  const qtdDezenas = parseInt(form.elements.qtd_dezenas.value, 10);
+  const [minDezenas, maxDezenas] = pool.faixa_dezenas;
+
+  // Fora das faixas: o servidor responde com a mensagem de erro de sempre
+  if (!(qtdJogos >= 1 && qtdJogos <= 12) || !(qtdDezenas >= minDezenas && qtdDezenas <= maxDezenas)) {
+    throw new Error("parâmetros fora da faixa");
+  }
+
+  const semRepeticao = form.elements.repeticao?.value === "lote";
+  const jogos = gerarJogosLocais(pool, qtdJogos, qtdDezenas, semRepeticao);
+
+  renderResultadoLocal(jogos, pool);
+  salvarHistorico({
+    data: new Date().toLocaleString(),
+    jogo: getJogoAtual(),
+    modo: pool.modo,
+    fonte: `${pool.fonte} (no aparelho)`,
+    jogos,
   });
+  renderHistorico();
 }
 
+function prepararGeracaoLocal() {
+  const form = document.querySelector("form[data-pool]");
+  if (!form) return;
+
+  // Aquece o cache (service worker) para a geração e para o uso offline
+  carregarPool(form.dataset.pool).catch(() => {});
+
+  form.addEventListener("submit", (event) => {
+    if (!podeGerarLocal(form)) return;
+    event.preventDefault();
+    gerarNoAparelho(form).catch((e) => {
+      console.warn("Geração no aparelho indisponível, usando o servidor:", e);
+      form.submit();
+    });
+  });
+}
+
+document.addEventListener("DOMContentLoaded", prepararGeracaoLocal);
+
 /* ================================
    Tema (claro/escuro) com persistência
 ================================ */
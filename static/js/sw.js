@@ -1,7 +1,8 @@
-const CACHE_NAME = "megasurpresinhas-v12.1";
+const CACHE_NAME = "megasurpresinhas-v14";
 
 const ASSETS = [
   "/", // importante para fallback offline/navegação
+  "/lotofacil",
   "/static/manifest.webmanifest",
   "/static/js/app.js",
   "/static/js/sw.js",
@@ -9,9 +10,14 @@ const ASSETS = [
   "/static/icons/icon-512.png"
 ];
 
+// Snapshots do pool (geração no aparelho). Opcionais: sem pool na instalação, o app usa o servidor
+const POOLS = ["/api/megasena/pool", "/api/lotofacil/pool"];
+
 self.addEventListener("install", (event) => {
   event.waitUntil(
-    caches.open(CACHE_NAME).then((cache) => cache.addAll(ASSETS))
+    caches.open(CACHE_NAME).then((cache) =>
+      cache.addAll(ASSETS).then(() => cache.addAll(POOLS).catch(() => {}))
+    )
   );
   self.skipWaiting();
 });
@@ -25,35 +31,44 @@ self.addEventListener("activate", (event) => {
   self.clients.claim();
 });
 
+// Busca na rede e guarda a resposta (só 200 sem redirecionamento) sob a própria URL.
+// O servidor manda ETag: a revalidação do navegador costuma voltar 304.
+function buscarEGuardar(req) {
+  return fetch(req).then((resp) => {
+    if (resp.ok && !resp.redirected) {
+      const copy = resp.clone();
+      caches.open(CACHE_NAME).then((cache) => cache.put(req, copy));
+    }
+    return resp;
+  });
+}
+
 self.addEventListener("fetch", (event) => {
   const req = event.request;
   const url = new URL(req.url);
 
   if (req.method !== "GET") return;
 
-  // 1) Navegação (HTML): network-first com fallback para cache da "/"
+  // 1) Navegação (HTML): stale-while-revalidate por URL; offline sem cópia cai na "/"
   if (req.mode === "navigate") {
     event.respondWith(
-      fetch(req)
-        .then((resp) => {
-          const copy = resp.clone();
-          caches.open(CACHE_NAME).then((cache) => cache.put("/", copy));
-          return resp;
-        })
-        .catch(() => caches.match("/"))
+      caches.match(req, { ignoreSearch: true }).then((cached) => {
+        const fetchPromise = buscarEGuardar(req).catch(() => cached || caches.match("/"));
+        if (cached) {
+          event.waitUntil(fetchPromise);
+          return cached;
+        }
+        return fetchPromise;
+      })
     );
     return;
   }
 
-  // 2) Assets estáticos: stale-while-revalidate (cache rápido + atualiza em background)
-  if (url.pathname.startsWith("/static/")) {
+  // 2) Assets estáticos e pool: stale-while-revalidate (cache rápido + atualiza em background)
+  if (url.pathname.startsWith("/static/") || POOLS.includes(url.pathname)) {
     event.respondWith(
       caches.match(req).then((cached) => {
-        const fetchPromise = fetch(req).then((networkResp) => {
-          caches.open(CACHE_NAME).then((cache) => cache.put(req, networkResp.clone()));
-          return networkResp;
-        }).catch(() => cached);
-
+        const fetchPromise = buscarEGuardar(req).catch(() => cached);
         return cached || fetchPromise;
       })
     );
@@ -1,16 +1,64 @@
 # storage.py
 from __future__ import annotations
 
+import atexit
+import bisect
 import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict, defaultdict
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
 
 from platformdirs import user_data_dir
 
+from jogos import LoteJogos
+from unicidade import IndiceJogosGerados
+
+_log = logging.getLogger(__name__)
+
 APP_NAME = "MegaSurpresinhas"
 APP_AUTHOR = "DavidMaciel_SmartSolutions"
 
+# =====================================================
+# Histórico: log append-only em segmentos JSONL
+# =====================================================
+#
+# historico/segmentos/segmento_<AAAAMMDD>_<NNNN>.jsonl, um registro por linha.
+# Rotação por dia e por tamanho; o nome ordena os segmentos cronologicamente.
+# Os arquivos antigos (surpresinhas_<timestamp>.json) podem ser importados com
+# importar_historicos_legados().
+
+# Tamanho máximo de um segmento (bytes). Sobrescrever com MEGASURP_HIST_SEGMENT_BYTES
+SEGMENTO_MAX_BYTES = int(os.getenv("MEGASURP_HIST_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+
+# Gravação em background (write-behind). MEGASURP_HIST_WRITE_BEHIND=0 grava na requisição.
+WRITE_BEHIND_ATIVO = os.getenv("MEGASURP_HIST_WRITE_BEHIND", "1") != "0"
+
+# Registros aguardando gravação (fila limitada)
+FILA_MAX = int(os.getenv("MEGASURP_HIST_QUEUE_SIZE", "10000"))
+
+# Registros por escrita (uma chamada write por lote)
+LOTE_MAX = int(os.getenv("MEGASURP_HIST_BATCH", "500"))
+
+# fsync: "sempre" (a cada lote), "nunca" (deixa para o SO) ou intervalo mínimo em segundos
+FSYNC = os.getenv("MEGASURP_HIST_FSYNC", "1.0")
+
+# Fila cheia: "sincrono" (grava na própria requisição), "bloquear" (espera vaga até
+# MEGASURP_HIST_BLOCK_TIMEOUT e depois grava síncrono) ou "descartar" (perde o registro)
+BACKPRESSURE = os.getenv("MEGASURP_HIST_BACKPRESSURE", "sincrono")
+BLOQUEIO_TIMEOUT = float(os.getenv("MEGASURP_HIST_BLOCK_TIMEOUT", "0.5"))
+
+_segmento_lock = threading.Lock()
+_segmento_atual: Optional[Path] = None
+
 
 def obter_pasta_historico() -> Path:
     base = Path(user_data_dir(APP_NAME, APP_AUTHOR))
@@ -19,33 +67,452 @@ def obter_pasta_historico() -> Path:
     return pasta
 
 
-def salvar_historico_json(
+def obter_pasta_segmentos() -> Path:
+    pasta = obter_pasta_historico() / "segmentos"
+    pasta.mkdir(parents=True, exist_ok=True)
+    return pasta
+
+
+def listar_segmentos() -> List[Path]:
+    """Segmentos do mais antigo ao mais recente."""
+    return sorted(obter_pasta_segmentos().glob("segmento_*.jsonl"))
+
+
+def novo_id_registro(instante_ns: Optional[int] = None) -> str:
+    """Único e ordenável pelo tempo: nanossegundos (hex) + 8 hex aleatórios."""
+    if instante_ns is None:
+        instante_ns = time.time_ns()
+    return f"{instante_ns:016x}{secrets.token_hex(4)}"
+
+
+def _proximo_segmento(pasta: Path, dia: str, atual: Optional[Path]) -> Path:
+    seq = 0
+    if atual is not None and atual.name.startswith(f"segmento_{dia}_"):
+        seq = int(atual.stem.rsplit("_", 1)[1]) + 1
+    return pasta / f"segmento_{dia}_{seq:04d}.jsonl"
+
+
+def _segmento_para_escrita(tamanho: int) -> Path:
+    """Segmento atual; rotaciona se virou o dia ou se não cabe mais `tamanho` bytes."""
+    global _segmento_atual
+
+    dia = datetime.now().strftime("%Y%m%d")
+    with _segmento_lock:
+        if _segmento_atual is None:
+            segmentos = listar_segmentos()
+            _segmento_atual = segmentos[-1] if segmentos else None
+
+        atual = _segmento_atual
+        if atual is None or not atual.name.startswith(f"segmento_{dia}_"):
+            _segmento_atual = _proximo_segmento(obter_pasta_segmentos(), dia, atual)
+        else:
+            try:
+                ocupado = atual.stat().st_size
+            except FileNotFoundError:
+                ocupado = 0
+            if ocupado and ocupado + tamanho > SEGMENTO_MAX_BYTES:
+                _segmento_atual = _proximo_segmento(atual.parent, dia, atual)
+
+        return _segmento_atual
+
+
+def _anexar(dados: bytes, fsync: bool = False) -> Path:
+    segmento = _segmento_para_escrita(len(dados))
+    # O_APPEND + uma única escrita: linhas de processos diferentes não se misturam
+    fd = os.open(segmento, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, dados)
+        if fsync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    return segmento
+
+
+def criar_registro(
     surpresinhas: List[List[int]],
     qtd_dezenas: int,
     qtd_surpresinhas: int,
-
-) -> Path:
-    pasta = obter_pasta_historico()
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    arquivo = pasta / f"surpresinhas_{timestamp}.json"
-
-    payload: Dict[str, Any] = {
-        "meta": {
-            "criado_em": datetime.now().isoformat(timespec="seconds"),
-            "qtd_surpresinhas": qtd_surpresinhas,
-            "qtd_dezenas": qtd_dezenas,
-        },
+    jogo: str,
+    semente: Optional[int] = None,
+) -> Dict[str, Any]:
+    meta: Dict[str, Any] = {
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "qtd_surpresinhas": qtd_surpresinhas,
+        "qtd_dezenas": qtd_dezenas,
+    }
+    if semente is not None:
+        meta["semente"] = semente  # reproduz o lote (mesmo pool/pesos/filtros)
+    return {
+        "id": novo_id_registro(),
+        "jogo": jogo,
+        "meta": meta,
         "surpresinhas": surpresinhas,
     }
 
-    arquivo.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    return arquivo
 
+def _linha(registro: Dict[str, Any]) -> bytes:
+    return (json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def salvar_historico_json(
+    surpresinhas: Union[LoteJogos, List[List[int]]],
+    qtd_dezenas: int,
+    qtd_surpresinhas: int,
+    jogo: str = "megasena",
+    semente: Optional[int] = None,
+) -> str:
+    """Anexa um registro ao log do histórico. Retorna o id do registro."""
+    if isinstance(surpresinhas, LoteJogos):
+        surpresinhas = surpresinhas.para_listas()
+
+    registro = criar_registro(surpresinhas, qtd_dezenas, qtd_surpresinhas, jogo, semente)
+    if WRITE_BEHIND_ATIVO:
+        GRAVADOR.enfileirar(registro)
+    else:
+        _anexar(_linha(registro))
+    # Visível já na próxima requisição (redirect para /historico/<id>), sem esperar a sync.
+    # O índice também repassa os jogos a INDICE_JOGOS_GERADOS.
+    INDICE_HISTORICO.registrar(registro)
+    return registro["id"]
+
+
+# =====================================================
+# Write-behind: fila limitada + thread gravadora
+# =====================================================
+
+class GravadorHistorico:
+    """
+    Tira o disco do caminho da requisição: registros entram numa fila limitada
+    e uma thread grava em lotes (um write por lote) com fsync controlado.
+    Registros ainda na fila continuam visíveis para leitura (pendentes()).
+    """
+
+    def __init__(self) -> None:
+        self._fila: "queue.Queue[dict]" = queue.Queue(maxsize=FILA_MAX)
+        self._pendentes: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._ultimo_fsync = 0.0
+        self.descartados = 0
+
+    def _garantir_iniciado(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # Fork: fila e pendentes herdados pertencem ao processo pai
+                self._fila = queue.Queue(maxsize=FILA_MAX)
+                self._pendentes = OrderedDict()
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._loop, name="gravador-historico", daemon=True
+            )
+            self._thread.start()
+
+    def enfileirar(self, registro: dict) -> None:
+        self._garantir_iniciado()
+        with self._lock:
+            self._pendentes[registro["id"]] = registro
+
+        try:
+            if BACKPRESSURE == "bloquear":
+                self._fila.put(registro, timeout=BLOQUEIO_TIMEOUT)
+            else:
+                self._fila.put_nowait(registro)
+            return
+        except queue.Full:
+            pass
+
+        if BACKPRESSURE == "descartar":
+            self.descartados += 1
+        else:
+            # "sincrono" (e "bloquear" após o timeout): grava agora, na requisição
+            _anexar(_linha(registro), fsync=self._precisa_fsync())
+        with self._lock:
+            self._pendentes.pop(registro["id"], None)
+
+    def pendentes(self) -> List[dict]:
+        """Registros ainda não gravados, do mais antigo ao mais recente."""
+        with self._lock:
+            return list(self._pendentes.values())
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera a fila esvaziar. Retorna False se o timeout estourar."""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._fila.all_tasks_done:
+            while self._fila.unfinished_tasks:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._fila.all_tasks_done.wait(restante)
+        return True
+
+    def _precisa_fsync(self) -> bool:
+        if FSYNC == "nunca":
+            return False
+        if FSYNC == "sempre":
+            return True
+        try:
+            intervalo = float(FSYNC)
+        except ValueError:
+            return False
+        agora = time.monotonic()
+        if agora - self._ultimo_fsync >= intervalo:
+            self._ultimo_fsync = agora
+            return True
+        return False
+
+    def _loop(self) -> None:
+        while True:
+            lote = [self._fila.get()]
+            while len(lote) < LOTE_MAX:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                _anexar(b"".join(_linha(r) for r in lote), fsync=self._precisa_fsync())
+            except OSError:
+                # Disco indisponível: mantém o processo vivo; os registros do lote se perdem
+                self.descartados += len(lote)
+            finally:
+                with self._lock:
+                    for registro in lote:
+                        self._pendentes.pop(registro["id"], None)
+                for _ in lote:
+                    self._fila.task_done()
+
+
+GRAVADOR = GravadorHistorico()
+
+
+def encerrar_gravacao(timeout: Optional[float] = 10.0) -> bool:
+    """Hook de desligamento (atexit / gunicorn worker_exit): grava o que está na fila."""
+    return GRAVADOR.flush(timeout)
+
+
+atexit.register(encerrar_gravacao)
+
+
+# =====================================================
+# Leitura
+# =====================================================
+
+def _decodificar(linha: bytes) -> Optional[dict]:
+    try:
+        registro = json.loads(linha)
+    except ValueError:
+        # Linha truncada (queda no meio da escrita): ignora
+        return None
+    if not isinstance(registro, dict):
+        _log.warning("Linha do histórico não é um objeto JSON: %.80r", linha)
+        return None
+    return registro
+
+
+def ler_historico(registro_id: str) -> Optional[dict]:
+    return INDICE_HISTORICO.obter(registro_id)
+
+
+# =====================================================
+# Índice do histórico (consulta paginada e por id)
+# =====================================================
+
+# Intervalo mínimo entre leituras de segmentos novos (registros de outros workers)
+INDICE_SYNC_INTERVALO = float(os.getenv("MEGASURP_HIST_INDEX_SYNC", "1.0"))
+
+
+class _Entrada:
+    __slots__ = ("id", "jogo", "meta", "mascaras")
+
+    def __init__(self, registro_id: str, jogo: Optional[str], meta: dict, mascaras: bytes) -> None:
+        self.id = registro_id
+        self.jogo = jogo
+        self.meta = meta
+        self.mascaras = mascaras  # uint64 por jogo (ver jogos.py)
+
+    def para_registro(self) -> dict:
+        lote = LoteJogos(np.frombuffer(self.mascaras, dtype=np.uint64))
+        return {
+            "id": self.id,
+            "jogo": self.jogo,
+            "meta": self.meta,
+            "surpresinhas": lote.para_listas(),
+        }
+
+
+class IndiceHistorico:
+    """
+    Índice em memória de todos os registros, por id (ordem de tempo), jogo e
+    qtd. de dezenas. Construído na primeira consulta e depois atualizado de
+    forma incremental: só lê os bytes novos do fim dos segmentos.
+    Os jogos ficam como máscaras (8 bytes por jogo), sem voltar ao disco.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entradas: Dict[str, _Entrada] = {}
+        # (jogo | None, qtd_dezenas | None) -> ids em ordem crescente
+        self._ordem: Dict[Tuple[Optional[str], Optional[int]], List[str]] = defaultdict(list)
+        # segmento -> bytes já indexados. Todos são relidos pelo fim: outro worker
+        # ainda pode anexar a um segmento anterior depois que este rotacionou.
+        self._lidos: Dict[str, int] = {}
+        self._proxima_sync = 0.0
+        # Chamados com as máscaras de cada registro novo (ex.: INDICE_JOGOS_GERADOS)
+        self._observadores: List[Callable[[np.ndarray], None]] = []
+
+    def observar(self, callback: Callable[[np.ndarray], None]) -> None:
+        self._observadores.append(callback)
+
+    def _adicionar(self, registro: dict) -> None:
+        registro_id = registro.get("id")
+        if not registro_id or registro_id in self._entradas:
+            return
+
+        meta = registro.get("meta") or {}
+        jogo = registro.get("jogo")
+        qtd_dezenas = meta.get("qtd_dezenas")
+        mascaras = LoteJogos.de_listas(registro.get("surpresinhas") or []).mascaras
+        self._entradas[registro_id] = _Entrada(registro_id, jogo, meta, mascaras.tobytes())
+        for callback in self._observadores:
+            callback(mascaras)
+
+        for chave in {(None, None), (jogo, None), (None, qtd_dezenas), (jogo, qtd_dezenas)}:
+            ids = self._ordem[chave]
+            if not ids or ids[-1] < registro_id:
+                ids.append(registro_id)
+            else:
+                bisect.insort(ids, registro_id)
+
+    def registrar(self, registro: dict) -> None:
+        """Registro salvo por este processo (antes de chegar ao disco)."""
+        with self._lock:
+            self._adicionar(registro)
+
+    def sincronizar(self, forcar: bool = False) -> None:
+        agora = time.monotonic()
+        with self._lock:
+            if forcar or agora >= self._proxima_sync:
+                self._proxima_sync = agora + INDICE_SYNC_INTERVALO
+                self._ler_segmentos()
+
+            # Registros deste processo ainda na fila de gravação
+            for registro in GRAVADOR.pendentes():
+                self._adicionar(registro)
+
+    def _ler_segmentos(self) -> None:
+        for segmento in listar_segmentos():
+            nome = segmento.name
+            lido = self._lidos.get(nome, 0)
+            try:
+                tamanho = segmento.stat().st_size
+            except FileNotFoundError:
+                continue
+            if tamanho <= lido:
+                continue
+
+            with segmento.open("rb") as f:
+                f.seek(lido)
+                dados = f.read(tamanho - lido)
+
+            fim = dados.rfind(b"\n") + 1  # só linhas completas
+            for linha in dados[:fim].splitlines():
+                registro = _decodificar(linha)
+                if registro is None:
+                    continue
+                try:
+                    self._adicionar(registro)
+                except (AttributeError, TypeError, ValueError) as e:
+                    # JSON válido mas fora do formato (ex.: dezena repetida): pula a
+                    # linha, senão ela seria relida e falharia em toda consulta
+                    _log.warning("Registro inválido em %s ignorado: %s", nome, e)
+
+            self._lidos[nome] = lido + fim
+
+    def obter(self, registro_id: str) -> Optional[dict]:
+        self.sincronizar()
+        entrada = self._entradas.get(registro_id)
+        return entrada.para_registro() if entrada is not None else None
+
+    def pagina(
+        self,
+        jogo: Optional[str] = None,
+        qtd_dezenas: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limite: int = 20,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Registros do mais recente ao mais antigo, anteriores a `cursor`.
+        Retorna (registros, proximo_cursor); proximo_cursor None = fim.
+        """
+        self.sincronizar()
+        with self._lock:
+            ids = self._ordem.get((jogo, qtd_dezenas), [])
+            fim = bisect.bisect_left(ids, cursor) if cursor else len(ids)
+            inicio = max(0, fim - limite)
+            selecionados = ids[inicio:fim][::-1]
+            entradas = [self._entradas[registro_id] for registro_id in selecionados]
+
+        proximo = selecionados[-1] if inicio > 0 and selecionados else None
+        return [entrada.para_registro() for entrada in entradas], proximo
+
+    def __len__(self) -> int:
+        self.sincronizar()
+        return len(self._entradas)
+
+
+INDICE_HISTORICO = IndiceHistorico()
+
+
+# =====================================================
+# Importação dos arquivos antigos (um JSON por geração)
+# =====================================================
+
+def importar_historicos_legados(remover: bool = False) -> int:
+    """
+    Converte historico/surpresinhas_*.json em registros do log.
+    Sem campo de jogo no formato antigo: 15+ dezenas = Lotofácil.
+    Retorna a quantidade importada.
+    """
+    importados = 0
+    for caminho in sorted(obter_pasta_historico().glob("surpresinhas_*.json")):
+        try:
+            dados = json.loads(caminho.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+
+        meta = dados.get("meta") or {}
+        qtd_dezenas = int(meta.get("qtd_dezenas") or 0)
+        try:
+            criado_em = datetime.fromisoformat(meta["criado_em"])
+            instante_ns = int(criado_em.timestamp() * 1_000_000_000)
+        except (KeyError, TypeError, ValueError):
+            instante_ns = int(caminho.stat().st_mtime_ns)
+
+        registro = {
+            "id": novo_id_registro(instante_ns),
+            "jogo": "lotofacil" if qtd_dezenas >= 15 else "megasena",
+            "meta": meta,
+            "surpresinhas": dados.get("surpresinhas") or [],
+        }
+        _anexar(_linha(registro))
+        importados += 1
 
-def listar_historicos() -> List[Path]:
-    pasta = obter_pasta_historico()
-    return sorted(pasta.glob("surpresinhas_*.json"), reverse=True)
+        if remover:
+            caminho.unlink(missing_ok=True)
+    return importados
 
 
-def ler_historico(caminho: Path) -> dict:
-    return json.loads(caminho.read_text(encoding="utf-8"))
+# Jogos já gerados (modo "nunca repetir"): segue o índice do histórico, que
+# lê incrementalmente os segmentos de todos os workers e a fila de gravação
+INDICE_JOGOS_GERADOS = IndiceJogosGerados(INDICE_HISTORICO.sincronizar)
+INDICE_HISTORICO.observar(INDICE_JOGOS_GERADOS.registrar)
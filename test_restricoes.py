@@ -0,0 +1,23 @@
+# test_restricoes.py
+import numpy as np
+import pytest
+
+from restricoes import Restricoes, iterar_jogos_restritos
+
+PESOS = np.ones(60)
+
+
+@pytest.mark.parametrize(
+    "restricoes",
+    [Restricoes(soma_min=-5), Restricoes(soma_max=-1), Restricoes(soma_min=-50, soma_max=200)],
+)
+def test_soma_negativa_rejeitada(restricoes):
+    with pytest.raises(ValueError, match="negativas"):
+        iterar_jogos_restritos(PESOS, 10, 6, restricoes, rng=1)
+
+
+def test_soma_respeitada():
+    blocos = list(iterar_jogos_restritos(PESOS, 200, 6, Restricoes(soma_min=0, soma_max=120), rng=1))
+    somas = np.concatenate(blocos).astype(int).sum(axis=1)
+    assert len(somas) == 200
+    assert somas.min() >= 21 and somas.max() <= 120
@@ -0,0 +1,122 @@
+# unicidade.py
+from __future__ import annotations
+
+import math
+import threading
+from typing import Callable, List
+
+import numpy as np
+
+# =====================================================
+# Filtro de Bloom (escalável) sobre máscaras de jogos
+# =====================================================
+#
+# Pertinência O(1) por jogo com ~14 bits por jogo (taxa de falso positivo 0,1%).
+# Falso positivo só faz um jogo inédito ser descartado e sorteado de novo;
+# jogo repetido nunca passa (não há falso negativo).
+
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_SAL = np.uint64(0xD6E8FEB86659FD93)
+
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    with np.errstate(over="ignore"):
+        z = x + _GOLDEN
+        z = (z ^ (z >> np.uint64(30))) * _MIX_1
+        z = (z ^ (z >> np.uint64(27))) * _MIX_2
+        return z ^ (z >> np.uint64(31))
+
+
+class _CamadaBloom:
+    def __init__(self, capacidade: int, taxa: float) -> None:
+        self.capacidade = capacidade
+        self.qtd = 0
+        self.bits = max(64, int(math.ceil(-capacidade * math.log(taxa) / (math.log(2) ** 2))))
+        self.k = max(1, round(self.bits / capacidade * math.log(2)))
+        self.tabela = np.zeros((self.bits + 7) // 8, dtype=np.uint8)
+
+    def _posicoes(self, mascaras: np.ndarray) -> np.ndarray:
+        h1 = _splitmix64(mascaras)
+        h2 = _splitmix64(mascaras ^ _SAL) | np.uint64(1)
+        i = np.arange(self.k, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            return (h1[:, None] + i * h2[:, None]) % np.uint64(self.bits)
+
+    def adicionar(self, mascaras: np.ndarray) -> None:
+        pos = self._posicoes(mascaras).ravel()
+        np.bitwise_or.at(self.tabela, pos >> np.uint64(3), np.left_shift(1, pos & np.uint64(7)).astype(np.uint8))
+        self.qtd += int(mascaras.shape[0])
+
+    def contem(self, mascaras: np.ndarray) -> np.ndarray:
+        pos = self._posicoes(mascaras)
+        bits = (self.tabela[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+
+class FiltroBloom:
+    """
+    Bloom escalável: quando a camada atual enche, abre outra com o dobro da
+    capacidade e metade da taxa de erro (erro total fica limitado a ~2× a taxa).
+    """
+
+    def __init__(self, capacidade_inicial: int = 100_000, taxa: float = 0.001) -> None:
+        self._taxa = taxa
+        self._camadas: List[_CamadaBloom] = [_CamadaBloom(capacidade_inicial, taxa / 2)]
+
+    def __len__(self) -> int:
+        return sum(c.qtd for c in self._camadas)
+
+    def adicionar(self, mascaras: np.ndarray) -> None:
+        mascaras = np.asarray(mascaras, dtype=np.uint64).ravel()
+        while mascaras.size:
+            camada = self._camadas[-1]
+            livre = camada.capacidade - camada.qtd
+            if livre <= 0:
+                taxa = self._taxa / (2 ** (len(self._camadas) + 1))
+                self._camadas.append(_CamadaBloom(camada.capacidade * 2, taxa))
+                continue
+            camada.adicionar(mascaras[:livre])
+            mascaras = mascaras[livre:]
+
+    def contem(self, mascaras: np.ndarray) -> np.ndarray:
+        mascaras = np.asarray(mascaras, dtype=np.uint64).ravel()
+        encontrado = np.zeros(mascaras.shape[0], dtype=bool)
+        for camada in self._camadas:
+            if camada.qtd:
+                encontrado |= camada.contem(mascaras)
+        return encontrado
+
+    def __contains__(self, mascara: object) -> bool:
+        return bool(self.contem(np.array([int(mascara)], dtype=np.uint64))[0])
+
+
+# =====================================================
+# Índice dos jogos já gerados (histórico)
+# =====================================================
+
+class IndiceJogosGerados:
+    """
+    Alimentado pelo índice do histórico (registrar, uma vez por registro novo:
+    deste worker, da fila de gravação ou lido do fim dos segmentos de outros
+    workers). Antes de cada consulta, `sincronizar` lê o que chegou ao disco.
+    Mega-Sena (6–12 dezenas) e Lotofácil (15–20) nunca colidem, então um
+    único índice serve aos dois jogos.
+    """
+
+    def __init__(self, sincronizar: Callable[[], None]) -> None:
+        self._sincronizar = sincronizar
+        self._filtro = FiltroBloom()
+        self._lock = threading.Lock()
+
+    def contem(self, mascaras: np.ndarray) -> np.ndarray:
+        self._sincronizar()
+        with self._lock:
+            return self._filtro.contem(mascaras)
+
+    def registrar(self, mascaras: np.ndarray) -> None:
+        if mascaras.size == 0:
+            return
+        with self._lock:
+            self._filtro.adicionar(mascaras)
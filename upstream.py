@@ -0,0 +1,104 @@
+# upstream.py
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# =====================================================
+# Cliente HTTP compartilhado da API de loterias (api.guidi.dev.br)
+# =====================================================
+
+COMMON_HEADERS = {
+    "Accept": "application/json, text/plain, */*",
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/126.0 Safari/537.36"
+    ),
+}
+
+# Máximo de requisições simultâneas à API em cada coleta.
+# Sobrescrever com env var MEGASURP_API_WORKERS
+MAX_WORKERS_API = int(os.getenv("MEGASURP_API_WORKERS", "5"))
+
+# Conexões mantidas (keep-alive) por processo. Padrão: cabe a coleta das duas
+# loterias ao mesmo tempo sem abrir conexão nova.
+HTTP_POOL_SIZE = int(os.getenv("MEGASURP_HTTP_POOL_SIZE", str(MAX_WORKERS_API * 2)))
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("MEGASURP_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("MEGASURP_HTTP_READ_TIMEOUT", "15"))
+
+# Retentativas com backoff exponencial (0.5s, 1s, 2s...) em falhas de conexão e 429/5xx.
+HTTP_RETRIES = int(os.getenv("MEGASURP_HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("MEGASURP_HTTP_BACKOFF", "0.5"))
+
+_sessao: Optional[requests.Session] = None
+_sessao_pid: Optional[int] = None
+_sessao_lock = threading.Lock()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _criar_sessao() -> requests.Session:
+    retry = Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=HTTP_RETRIES,
+        status=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+
+    sessao = requests.Session()
+    sessao.headers.update(COMMON_HEADERS)
+    sessao.mount("https://", adapter)
+    sessao.mount("http://", adapter)
+    return sessao
+
+
+def obter_sessao() -> requests.Session:
+    """
+    Sessão única por processo (conexões reaproveitadas entre requisições).
+    Recriada após fork (workers do gunicorn não herdam sockets do master).
+    """
+    global _sessao, _sessao_pid
+
+    pid = os.getpid()
+    if _sessao is not None and _sessao_pid == pid:
+        return _sessao
+
+    with _sessao_lock:
+        if _sessao is None or _sessao_pid != pid:
+            _sessao = _criar_sessao()
+            _sessao_pid = pid
+        return _sessao
+
+
+def obter_json(url: str) -> dict:
+    resp = obter_sessao().get(url, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    resp.raise_for_status()
+    return resp.json()
+
+
+def buscar_em_paralelo(buscar: Callable[[T], R], itens: Iterable[T]) -> List[R]:
+    """Aplica `buscar` em paralelo (até MAX_WORKERS_API), preservando a ordem de `itens`."""
+    itens = list(itens)
+    if not itens:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS_API, len(itens))) as executor:
+        return list(executor.map(buscar, itens))
@@ -1,33 +1,106 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import numpy as np
 import requests
 
 from flask import (
     Flask,
     request,
-    render_template_string,
+    render_template,
     redirect,
     url_for,
     send_from_directory,
     make_response,
+    jsonify,
+    Response,
 )
 
-from core import gerar_surpresinhas, preparar_pool_com_globo_com_status
+from atualizador import ATUALIZADOR, ATUALIZADOR_ATIVO
+from backtest import FAIXAS as FAIXAS_BACKTEST, backtest
+
+from core import (
+    concurso_em_cache as concurso_em_cache_megasena,
+    gerar_fechamento_megasena,
+    gerar_surpresinhas,
+    iterar_surpresinhas,
+    preparar_pool_com_globo_com_status,
+)
 from storage import (
+    INDICE_HISTORICO,
+    INDICE_JOGOS_GERADOS,
     obter_pasta_historico,
-    listar_historicos,
     ler_historico,
     salvar_historico_json,
 )
 
 from core_lotofacil import (
+    concurso_em_cache as concurso_em_cache_lotofacil,
+    gerar_fechamento_lotofacil,
     preparar_pool_lotofacil_com_status,
     gerar_surpresinhas_lotofacil,
+    iterar_surpresinhas_lotofacil,
 )
+from amostragem import nova_semente, pesos_do_pool
+from estatisticas import ESTATISTICAS
+from fechamento import FechamentoGrandeDemais
+from jogos import LoteJogos
+from ponderacao import PONDERACAO_PADRAO, pesos_para
+from restricoes import Restricoes
+from sorteios import TOTAL_DEZENAS, HistoricoVazio
 
 app = Flask(__name__)
 
 
+@app.before_request
+def _iniciar_atualizador():
+    # Com gunicorn a thread já sobe no post_fork (gunicorn.conf.py); isto cobre
+    # o servidor de desenvolvimento e custa só uma comparação de pid por requisição.
+    if ATUALIZADOR_ATIVO:
+        ATUALIZADOR.garantir_iniciado()
+
+
+# =====================================================
+# Cache HTTP: validadores (ETag / Last-Modified) e 304
+# =====================================================
+
+# Páginas iniciais: navegador/CDN revalidam sempre, e a revalidação custa um 304
+CACHE_CONTROL_PAGINA = os.getenv("MEGASURP_CACHE_PAGINA", "public, no-cache")
+
+# Registro do histórico não muda depois de criado
+HISTORICO_REGISTRO_MAX_AGE = 86400
+
+# Mesma data em todos os workers (muda a cada deploy)
+_PUBLICADO_EM = datetime.fromtimestamp(int(os.path.getmtime(__file__)), timezone.utc)
+
+
+def _condicional(
+    resp: Response,
+    cache_control: str,
+    etag: Optional[str] = None,
+    ultima_modificacao: Optional[datetime] = None,
+) -> Response:
+    """ETag (do corpo se não informado), Cache-Control e 304 se o cliente já tem a versão."""
+    if etag is None:
+        resp.add_etag()
+    else:
+        resp.set_etag(etag)
+    if ultima_modificacao is not None:
+        resp.last_modified = ultima_modificacao
+    resp.headers["Cache-Control"] = cache_control
+    return resp.make_conditional(request)
+
+
+@app.get("/api/status")
+def api_status():
+    return _condicional(jsonify(ATUALIZADOR.estado()), "no-cache")
+
+
 @app.get("/sw.js")
 def service_worker():
     resp = make_response(send_from_directory("static/js", "sw.js"))
@@ -36,7 +109,11 @@ def service_worker():
     return resp
 
 
-HTML = """
+# Página dividida em 3 partes:
+# - cabeçalho (CSS, topo, navegação) e rodapé só dependem do jogo: renderizados
+#   uma vez por jogo e reaproveitados;
+# - corpo (formulário, status, resultado): compilado uma vez, renderizado por requisição.
+HTML_CABECALHO = """
 <!doctype html>
 <html lang="pt-br">
 <head>
@@ -244,8 +321,11 @@ HTML = """
     </a>
   </div>
 
+"""
+
+HTML_CORPO = """
   <div class="box">
-    <form method="post" action="{{ form_action or url_for('gerar') }}">
+    <form method="post" action="{{ form_action or url_for('gerar') }}" data-pool="{{ pool_url }}">
       <div class="row">
 
         <label>Qtd. surpresinhas (1–12)
@@ -259,8 +339,32 @@ HTML = """
                  value="{{ qtd_dezenas }}">
         </label>
 
+        <label>Repetições
+          <select name="repeticao">
+            <option value="permitir">Permitir</option>
+            <option value="lote" {{ 'selected' if repeticao == 'lote' else '' }}>Sem repetição no lote</option>
+            <option value="historico" {{ 'selected' if repeticao == 'historico' else '' }}>Nunca repetir (lote + histórico)</option>
+          </select>
+        </label>
+
         <button type="submit">Gerar</button>
       </div>
+
+      <details {{ 'open' if filtros else '' }}>
+        <summary class="small">Filtros (opcionais)</summary>
+        <div class="row">
+          {% for campo, rotulo in CAMPOS_RESTRICOES %}
+          <label>{{ rotulo }}
+            <input type="number" name="{{ campo }}" min="0" value="{{ filtros.get(campo, '') }}">
+          </label>
+          {% endfor %}
+        </div>
+        <p class="small">
+          Com filtros, a chance de cada jogo válido é proporcional ao produto dos pesos
+          das suas dezenas; sem filtros, as dezenas são sorteadas uma a uma sem reposição.
+          As chances por dezena diferem um pouco (até ~2 pontos percentuais).
+        </p>
+      </details>
     </form>
 
     <p class="small">
@@ -307,10 +411,14 @@ HTML = """
         {% endfor %}
       </div>
 
-      <div class="small">Histórico salvo em: <b>{{ caminho_salvo }}</b></div>
+      <div class="small">
+        Histórico salvo: registro <b>{{ registro_salvo }}</b>{% if semente is not none %} · semente <b>{{ semente }}</b>{% endif %}
+      </div>
     </div>
   {% endif %}
 
+  <div class="box" id="resultado-local" hidden></div>
+
   <div class="box">
     <b>Histórico neste dispositivo:</b>
 
@@ -360,6 +468,9 @@ HTML = """
     });
   </script>
 
+"""
+
+HTML_RODAPE = """
   <footer class="creditos">
     By David Maciel
   </footer>
@@ -375,156 +486,256 @@ def _parse_int(value: str, default: int) -> int:
         return default
 
 
+def _parse_repeticao(value: str):
+    """
+    "permitir" | "lote" | "historico" -> (sem_repeticao, excluir)
+    "historico" também proíbe qualquer jogo já salvo no histórico.
+    """
+    if value == "historico":
+        return True, INDICE_JOGOS_GERADOS
+    if value == "lote":
+        return True, None
+    return False, None
+
+
+# Campo do formulário/API -> rótulo (restricoes.Restricoes)
+CAMPOS_RESTRICOES = (
+    ("soma_min", "Soma mínima"),
+    ("soma_max", "Soma máxima"),
+    ("impares", "Qtd. ímpares"),
+    ("baixas", "Qtd. na 1ª metade"),
+    ("max_consecutivos", "Máx. consecutivas"),
+)
+
+
+def _parse_restricoes(dados) -> Tuple[Optional[Restricoes], dict]:
+    """
+    Campos vazios são ignorados. Retorna (restrições ou None, valores informados).
+    ValueError se algum campo não for inteiro.
+    """
+    valores = {}
+    for campo, rotulo in CAMPOS_RESTRICOES:
+        valor = dados.get(campo)
+        if valor in (None, ""):
+            continue
+        try:
+            valores[campo] = int(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"{rotulo} deve ser um inteiro.") from None
+    return (Restricoes(**valores) if valores else None), valores
+
+
+def _pesos_padrao(jogo: str):
+    """
+    Pesos da ponderação padrão (MEGASURP_PONDERACAO) para as páginas.
+    None = pool do cache; também quando o histórico completo ainda não existe.
+    """
+    try:
+        return pesos_para(jogo, PONDERACAO_PADRAO)
+    except (RuntimeError, ValueError):
+        return None
+
+
+# =====================================================
+# Renderização (templates compilados uma vez)
+# =====================================================
+
+# Diferenças entre as páginas de cada jogo
+VARIANTES = {
+    "mega": {
+        "titulo": "MegaSurpresinhas Mega-Sena",
+        "form_endpoint": "gerar",
+        "api_jogo": "megasena",
+        "qtd_dezenas": 6,
+        "range_min_dezenas": 6,
+        "range_max_dezenas": 12,
+    },
+    "lotofacil": {
+        "titulo": "MegaSurpresinhas Lotofácil",
+        # 👇 dica: usamos isso para o form apontar para /lotofacil/gerar
+        "form_endpoint": "lotofacil_gerar",
+        "api_jogo": "lotofacil",
+        "qtd_dezenas": 15,  # Lotofácil: 15–20
+        "range_min_dezenas": 15,
+        "range_max_dezenas": 20,
+    },
+}
+
+TEMPLATE_CORPO = app.jinja_env.from_string(HTML_CORPO)
+
+# Cabeçalho + rodapé já renderizados, por jogo
+_CASCA = {
+    jogo_nome: (
+        app.jinja_env.from_string(HTML_CABECALHO).render(
+            titulo=variante["titulo"], jogo_nome=jogo_nome
+        ),
+        app.jinja_env.from_string(HTML_RODAPE).render(),
+    )
+    for jogo_nome, variante in VARIANTES.items()
+}
+
+
+def _render_pagina(jogo_nome: str, **contexto) -> str:
+    """
+    Página completa do jogo: casca pronta + corpo renderizado com o contexto.
+    Valores não informados usam os padrões do jogo.
+    """
+    variante = VARIANTES[jogo_nome]
+    cabecalho, rodape = _CASCA[jogo_nome]
+
+    dados = {
+        "qtd_surpresinhas": 3,
+        "qtd_dezenas": variante["qtd_dezenas"],
+        "pasta_historico": str(obter_pasta_historico()),
+        "resultado": None,
+        "registro_salvo": None,
+        "semente": None,
+        "historico_detalhe": None,
+        "erro": None,
+        "modo": None,
+        "msg_status": None,
+        "fonte": None,
+        "jogo_nome": jogo_nome,
+        "form_action": url_for(variante["form_endpoint"]),
+        "pool_url": url_for("api_pool", jogo=variante["api_jogo"]),
+        "range_min_dezenas": variante["range_min_dezenas"],
+        "range_max_dezenas": variante["range_max_dezenas"],
+        "filtros": {},
+        "CAMPOS_RESTRICOES": CAMPOS_RESTRICOES,
+    }
+    dados.update(contexto)
+
+    return cabecalho + render_template(TEMPLATE_CORPO, **dados) + rodape
+
+
+def _render_erro(
+    msg: str,
+    qtd_surpresinhas: int,
+    qtd_dezenas: int,
+    jogo_nome: str = "mega",
+):
+    return _render_pagina(
+        jogo_nome,
+        qtd_surpresinhas=qtd_surpresinhas,
+        qtd_dezenas=qtd_dezenas,
+        erro=msg,
+    )
+
+
+# (jogo, pasta do histórico) -> (html, etag)
+_PAGINAS_INICIAIS: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+
+def _pagina_inicial(jogo_nome: str) -> Response:
+    """
+    GET da página do jogo: o HTML só muda com o deploy (o histórico é
+    carregado no cliente), então é renderizado uma vez e revalidado por ETag.
+    """
+    chave = (jogo_nome, str(obter_pasta_historico()))
+    pronta = _PAGINAS_INICIAIS.get(chave)
+    if pronta is None:
+        html = _render_pagina(jogo_nome)
+        pronta = (html, hashlib.sha1(html.encode("utf-8")).hexdigest()[:20])
+        _PAGINAS_INICIAIS[chave] = pronta
+
+    html, etag = pronta
+    resp = Response(html, mimetype="text/html")
+    return _condicional(resp, CACHE_CONTROL_PAGINA, etag, _PUBLICADO_EM)
+
+
 @app.get("/")
 def index():
-    pasta = str(obter_pasta_historico())
-    historicos = listar_historicos()[:10]
-    return render_template_string(
-        HTML,
-        qtd_surpresinhas=3,
-        qtd_dezenas=6,
-        pasta_historico=pasta,
-        resultado=None,
-        caminho_salvo=None,
-        historicos=historicos,
-        historico_detalhe=None,
-        erro=None,
-        modo=None,
-        msg_status=None,
-        fonte=None,
-        jogo_nome="mega",
-    )
+    return _pagina_inicial("mega")
 
 
 @app.get("/lotofacil")
 def lotofacil_index():
-    pasta = str(obter_pasta_historico())
-    historicos = listar_historicos()[:10]
-
-    return render_template_string(
-        HTML,
-        # defaults da Lotofácil
-        qtd_surpresinhas=3,  # quantidade de jogos
-        qtd_dezenas=15,  # Lotofácil: 15–20
-        pasta_historico=pasta,
-        resultado=None,
-        caminho_salvo=None,
-        historicos=historicos,
-        historico_detalhe=None,
-        erro=None,
-        modo=None,
-        msg_status=None,
-        fonte=None,
-        # 👇 dica: usamos isso para o form apontar para /lotofacil/gerar
-        jogo_nome="lotofacil",
-        form_action=url_for("lotofacil_gerar"),
-        titulo="MegaSurpresinhas Lotofácil",
-        range_min_dezenas=15,
-        range_max_dezenas=20,
-    )
+    return _pagina_inicial("lotofacil")
 
 
 @app.post("/lotofacil/gerar")
 def lotofacil_gerar():
     qtd_surpresinhas = _parse_int(request.form.get("qtd_surpresinhas", "3"), 3)
     qtd_dezenas = _parse_int(request.form.get("qtd_dezenas", "15"), 15)
+    repeticao = request.form.get("repeticao", "permitir")
+    sem_repeticao, excluir = _parse_repeticao(repeticao)
 
     # validações específicas Lotofácil
     if not (1 <= qtd_surpresinhas <= 12):
-        return _render_erro_lotofacil(
+        return _render_erro(
             "Qtd. de surpresinhas deve ser entre 1 e 12.",
             qtd_surpresinhas,
             qtd_dezenas,
+            "lotofacil",
         )
 
     if not (15 <= qtd_dezenas <= 20):
-        return _render_erro_lotofacil(
+        return _render_erro(
             "Qtd. de dezenas da Lotofácil deve ser entre 15 e 20.",
             qtd_surpresinhas,
             qtd_dezenas,
+            "lotofacil",
         )
 
     try:
+        restricoes, filtros = _parse_restricoes(request.form)
         pool, modo, fonte, msg_status = preparar_pool_lotofacil_com_status()
+        semente = nova_semente()
         surpresinhas = gerar_surpresinhas_lotofacil(
             qtd_surpresinhas,
             qtd_dezenas,
             pool,
+            semente,
+            sem_repeticao=sem_repeticao,
+            excluir=excluir,
+            pesos=_pesos_padrao("lotofacil"),
+            restricoes=restricoes,
         )
 
-        caminho = salvar_historico_json(
+        registro_id = salvar_historico_json(
             surpresinhas=surpresinhas,
             qtd_dezenas=qtd_dezenas,
             qtd_surpresinhas=qtd_surpresinhas,
+            jogo="lotofacil",
+            semente=semente,
         )
 
     except (requests.exceptions.RequestException, RuntimeError):
-        return _render_erro_lotofacil(
+        return _render_erro(
             "Falha ao acessar os resultados oficiais da Lotofácil. Verifique sua conexão.",
             qtd_surpresinhas,
             qtd_dezenas,
+            "lotofacil",
         )
 
     except ValueError as e:
-        return _render_erro_lotofacil(
+        return _render_erro(
             f"Erro de validação dos dados: {e}",
             qtd_surpresinhas,
             qtd_dezenas,
+            "lotofacil",
         )
 
     except Exception as e:
-        return _render_erro_lotofacil(
+        return _render_erro(
             f"Erro inesperado ao gerar as surpresinhas: {e}",
             qtd_surpresinhas,
             qtd_dezenas,
+            "lotofacil",
         )
 
-    pasta = str(obter_pasta_historico())
-    historicos = listar_historicos()[:10]
-
-    return render_template_string(
-        HTML,
+    return _render_pagina(
+        "lotofacil",
         qtd_surpresinhas=qtd_surpresinhas,
         qtd_dezenas=qtd_dezenas,
-        pasta_historico=pasta,
         resultado=surpresinhas,
-        caminho_salvo=str(caminho),
-        historicos=historicos,
-        historico_detalhe=None,
-        erro=None,
+        repeticao=repeticao,
+        filtros=filtros,
+        registro_salvo=registro_id,
+        semente=semente,
         modo=modo,
         msg_status=msg_status,
         fonte=fonte,
-        jogo_nome="lotofacil",
-        form_action=url_for("lotofacil_gerar"),
-        titulo="MegaSurpresinhas Lotofácil",
-        range_min_dezenas=15,
-        range_max_dezenas=20,
-    )
-
-
-def _render_erro_lotofacil(msg: str, qtd_surpresinhas: int, qtd_dezenas: int):
-    pasta = str(obter_pasta_historico())
-    historicos = listar_historicos()[:10]
-
-    return render_template_string(
-        HTML,
-        qtd_surpresinhas=qtd_surpresinhas,
-        qtd_dezenas=qtd_dezenas,
-        pasta_historico=pasta,
-        resultado=None,
-        caminho_salvo=None,
-        historicos=historicos,
-        historico_detalhe=None,
-        erro=msg,
-        modo=None,
-        msg_status=None,
-        fonte=None,
-        jogo_nome="lotofacil",
-        form_action=url_for("lotofacil_gerar"),
-        titulo="MegaSurpresinhas Lotofácil",
-        range_min_dezenas=15,
-        range_max_dezenas=20,
     )
 
 
@@ -532,6 +743,8 @@ def _render_erro_lotofacil(msg: str, qtd_surpresinhas: int, qtd_dezenas: int):
 def gerar():
     qtd_surpresinhas = _parse_int(request.form.get("qtd_surpresinhas", "3"), 3)
     qtd_dezenas = _parse_int(request.form.get("qtd_dezenas", "6"), 6)
+    repeticao = request.form.get("repeticao", "permitir")
+    sem_repeticao, excluir = _parse_repeticao(repeticao)
 
     # validações
     if not (1 <= qtd_surpresinhas <= 12):
@@ -549,13 +762,26 @@ def gerar():
         )
 
     try:
+        restricoes, filtros = _parse_restricoes(request.form)
         pool, modo, fonte, msg_status = preparar_pool_com_globo_com_status()
-        surpresinhas = gerar_surpresinhas(qtd_surpresinhas, qtd_dezenas, pool)
+        semente = nova_semente()
+        surpresinhas = gerar_surpresinhas(
+            qtd_surpresinhas,
+            qtd_dezenas,
+            pool,
+            semente,
+            sem_repeticao=sem_repeticao,
+            excluir=excluir,
+            pesos=_pesos_padrao("megasena"),
+            restricoes=restricoes,
+        )
 
-        caminho = salvar_historico_json(
+        registro_id = salvar_historico_json(
             surpresinhas=surpresinhas,
             qtd_dezenas=qtd_dezenas,
             qtd_surpresinhas=qtd_surpresinhas,
+            jogo="megasena",
+            semente=semente,
         )
 
     except (requests.exceptions.RequestException, RuntimeError):
@@ -580,72 +806,363 @@ def gerar():
         )
 
     # sucesso
-    pasta = str(obter_pasta_historico())
-    historicos = listar_historicos()[:10]
-
-    return render_template_string(
-        HTML,
+    return _render_pagina(
+        "mega",
         qtd_surpresinhas=qtd_surpresinhas,
         qtd_dezenas=qtd_dezenas,
-        pasta_historico=pasta,
         resultado=surpresinhas,
-        caminho_salvo=str(caminho),
-        historicos=historicos,
-        historico_detalhe=None,
-        erro=None,
+        repeticao=repeticao,
+        filtros=filtros,
+        registro_salvo=registro_id,
+        semente=semente,
         modo=modo,
         msg_status=msg_status,
         fonte=fonte,
-        jogo_nome="mega",
     )
 
 
-@app.get("/historico/<nome>")
-def ver_historico(nome: str):
-    pasta = obter_pasta_historico()
-    caminho = pasta / nome
-    if not caminho.exists():
+@app.get("/historico/<registro_id>")
+def ver_historico(registro_id: str):
+    data = ler_historico(registro_id)
+    if data is None:
         return redirect(url_for("index"))
 
-    data = ler_historico(caminho)
-
-    pasta_str = str(pasta)
-    historicos = listar_historicos()[:10]
-    return render_template_string(
-        HTML,
-        qtd_surpresinhas=3,
-        qtd_dezenas=6,
-        pasta_historico=pasta_str,
-        resultado=None,
-        caminho_salvo=None,
-        historicos=historicos,
-        historico_detalhe=data,
-        erro=None,
-        modo=None,
-        msg_status=None,
-        fonte=None,
-        jogo_nome="mega",
-    )
+    jogo_nome = "lotofacil" if data.get("jogo") == "lotofacil" else "mega"
+    return _render_pagina(jogo_nome, historico_detalhe=data)
 
 
-def _render_erro(msg: str, qtd_surpresinhas: int, qtd_dezenas: int):
-    pasta = str(obter_pasta_historico())
-    historicos = listar_historicos()[:10]
-    return render_template_string(
-        HTML,
-        qtd_surpresinhas=qtd_surpresinhas,
+# =====================================================
+# API do histórico (servida pelo índice em memória)
+# =====================================================
+
+def _erro_api(msg: str, status: int = 400):
+    return jsonify({"erro": msg}), status
+
+
+def _corpo_json(aceita_form: bool = False):
+    """
+    Corpo da requisição para .get(): objeto JSON ou, sem JSON, o form
+    (se aceita_form) ou {}. None se o JSON não for um objeto (a rota responde 400).
+    """
+    dados = request.get_json(silent=True)
+    if dados is None or dados == {}:
+        return request.form if aceita_form else {}
+    return dados if isinstance(dados, dict) else None
+
+
+HISTORICO_LIMITE_MAX = 200
+
+
+@app.get("/api/historico")
+def api_historico():
+    """
+    Paginação por cursor, do mais recente ao mais antigo.
+    Filtros: jogo (megasena | lotofacil), dezenas. limit: 1–200 (padrão 20).
+    """
+    jogo = request.args.get("jogo") or None
+    cursor = request.args.get("cursor") or None
+    try:
+        dezenas = request.args.get("dezenas")
+        qtd_dezenas = int(dezenas) if dezenas else None
+        limite = int(request.args.get("limit", 20))
+    except ValueError:
+        return _erro_api("dezenas e limit devem ser inteiros.")
+
+    if not (1 <= limite <= HISTORICO_LIMITE_MAX):
+        return _erro_api(f"limit deve ser entre 1 e {HISTORICO_LIMITE_MAX}.")
+
+    registros, proximo_cursor = INDICE_HISTORICO.pagina(
+        jogo=jogo,
         qtd_dezenas=qtd_dezenas,
-        pasta_historico=pasta,
-        resultado=None,
-        caminho_salvo=None,
-        historicos=historicos,
-        historico_detalhe=None,
-        erro=msg,
-        modo=None,
-        msg_status=None,
-        fonte=None,
-        jogo_nome="mega",
+        cursor=cursor,
+        limite=limite,
     )
+    return _condicional(jsonify({"itens": registros, "proximo_cursor": proximo_cursor}), "no-cache")
+
+
+@app.get("/api/historico/<registro_id>")
+def api_historico_registro(registro_id: str):
+    registro = INDICE_HISTORICO.obter(registro_id)
+    if registro is None:
+        return _erro_api("Registro não encontrado.", 404)
+    return _condicional(
+        jsonify(registro), f"public, max-age={HISTORICO_REGISTRO_MAX_AGE}", f"registro-{registro_id}"
+    )
+
+
+# =====================================================
+# API de geração em lote (NDJSON em streaming)
+# =====================================================
+
+# Limite de jogos por requisição da API (a memória não cresce com a quantidade)
+API_MAX_JOGOS = int(os.getenv("MEGASURP_API_MAX_JOGOS", "10000000"))
+
+API_JOGOS = {
+    "megasena": {
+        "preparar_pool": preparar_pool_com_globo_com_status,
+        "concurso_em_cache": concurso_em_cache_megasena,
+        "iterar": iterar_surpresinhas,
+        "fechamento": gerar_fechamento_megasena,
+        "total_dezenas": TOTAL_DEZENAS["megasena"],
+        "qtd_dezenas": 6,
+        "faixa_dezenas": (6, 12),
+    },
+    "lotofacil": {
+        "preparar_pool": preparar_pool_lotofacil_com_status,
+        "concurso_em_cache": concurso_em_cache_lotofacil,
+        "iterar": iterar_surpresinhas_lotofacil,
+        "fechamento": gerar_fechamento_lotofacil,
+        "total_dezenas": TOTAL_DEZENAS["lotofacil"],
+        "qtd_dezenas": 15,
+        "faixa_dezenas": (15, 20),
+    },
+}
+
+
+@app.post("/api/<jogo>/gerar")
+def api_gerar(jogo: str):
+    """
+    Corpo (JSON ou form): qtd_jogos, qtd_dezenas, seed (opcional),
+    repeticao ("permitir" | "lote" | "historico", opcional),
+    ponderacao ("pool" | "janela:N" | "decaimento:M" | "inversa" | "uniforme", opcional),
+    soma_min, soma_max, impares, baixas, max_consecutivos (opcionais).
+    Com algum filtro, P(jogo) é proporcional ao produto dos pesos das dezenas
+    (restricoes.py); sem filtros, sorteio sucessivo ponderado sem reposição.
+    As duas distribuições não coincidem: qualquer filtro muda um pouco as chances.
+    Resposta: um jogo por linha (NDJSON), gerado em blocos sob demanda.
+    """
+    config = API_JOGOS.get(jogo)
+    if config is None:
+        return _erro_api(f"Jogo desconhecido: {jogo}", 404)
+
+    dados = _corpo_json(aceita_form=True)
+    if dados is None:
+        return _erro_api("Corpo JSON deve ser um objeto.")
+    try:
+        qtd_jogos = int(dados.get("qtd_jogos", 1))
+        qtd_dezenas = int(dados.get("qtd_dezenas", config["qtd_dezenas"]))
+        seed = dados.get("seed")
+        seed = nova_semente() if seed in (None, "") else int(seed)
+    except (TypeError, ValueError):
+        return _erro_api("Parâmetros inválidos: qtd_jogos, qtd_dezenas e seed devem ser inteiros.")
+
+    if not (1 <= qtd_jogos <= API_MAX_JOGOS):
+        return _erro_api(f"qtd_jogos deve ser entre 1 e {API_MAX_JOGOS}.")
+    if seed < 0:
+        return _erro_api("seed deve ser um inteiro não negativo.")
+
+    min_dezenas, max_dezenas = config["faixa_dezenas"]
+    if not (min_dezenas <= qtd_dezenas <= max_dezenas):
+        return _erro_api(f"qtd_dezenas deve ser entre {min_dezenas} e {max_dezenas}.")
+
+    try:
+        pool, modo, fonte, _msg_status = config["preparar_pool"]()
+        sem_repeticao, excluir = _parse_repeticao(dados.get("repeticao", "permitir"))
+        ponderacao = dados.get("ponderacao") or PONDERACAO_PADRAO
+        restricoes, _filtros = _parse_restricoes(dados)
+        blocos = config["iterar"](
+            qtd_jogos,
+            qtd_dezenas,
+            pool,
+            seed,
+            sem_repeticao,
+            excluir,
+            pesos_para(jogo, ponderacao),
+            restricoes,
+        )
+    except ValueError as e:
+        return _erro_api(f"Erro de validação dos dados: {e}")
+    except RuntimeError as e:
+        return _erro_api(str(e), 503)
+
+    def linhas():
+        for bloco in blocos:
+            yield "".join(
+                "[" + ",".join(map(str, jogo)) + "]\n" for jogo in bloco.tolist()
+            )
+
+    resp = Response(linhas(), mimetype="application/x-ndjson")
+    resp.headers["X-Modo"] = modo
+    resp.headers["X-Fonte"] = fonte
+    resp.headers["X-Seed"] = str(seed)
+    resp.headers["X-Ponderacao"] = ponderacao
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+# =====================================================
+# Snapshot do pool (geração no cliente / offline)
+# =====================================================
+
+# O pool muda no máximo uma vez por concurso; o ETag cobre a revalidação
+POOL_MAX_AGE = int(os.getenv("MEGASURP_POOL_MAX_AGE", "300"))
+
+
+@app.get("/api/<jogo>/pool")
+def api_pool(jogo: str):
+    """
+    Pesos da ponderação padrão (índice 0 = dezena 1), concurso e modo/fonte:
+    o suficiente para o app sortear os jogos no aparelho, com a mesma distribuição.
+    """
+    config = API_JOGOS.get(jogo)
+    if config is None:
+        return _erro_api(f"Jogo desconhecido: {jogo}", 404)
+
+    try:
+        pool, modo, fonte, _msg_status = config["preparar_pool"]()
+        pesos = _pesos_padrao(jogo)
+        ponderacao = PONDERACAO_PADRAO if pesos is not None else "pool"
+        if pesos is None:
+            pesos = pesos_do_pool(pool, config["total_dezenas"])
+    except (RuntimeError, ValueError) as e:
+        return _erro_api(str(e), 503)
+
+    snapshot = {
+        "jogo": jogo,
+        "concurso": config["concurso_em_cache"](),
+        "modo": modo,
+        "fonte": fonte,
+        "ponderacao": ponderacao,
+        "qtd_dezenas": config["qtd_dezenas"],
+        "faixa_dezenas": list(config["faixa_dezenas"]),
+        "pesos": [int(p) if float(p).is_integer() else round(float(p), 6) for p in pesos],
+    }
+    versao = hashlib.sha1(json.dumps(snapshot, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    snapshot["versao"] = versao
+
+    # Pool de fallback (sem rede): revalida sempre, para o online chegar logo ao app
+    cache_control = f"public, max-age={POOL_MAX_AGE}" if modo == "online" else "public, no-cache"
+    resp = Response(json.dumps(snapshot, separators=(",", ":")), mimetype="application/json")
+    return _condicional(resp, cache_control, versao)
+
+
+# =====================================================
+# Backtest contra o histórico completo de sorteios
+# =====================================================
+
+API_BACKTEST_MAX_JOGOS = int(os.getenv("MEGASURP_API_BACKTEST_MAX_JOGOS", "1000000"))
+
+
+def _validar_jogos(lote: LoteJogos, config: dict) -> Optional[str]:
+    """Mensagem do primeiro jogo fora do tipo (dezenas 1..total, quantidade na faixa), ou None."""
+    total = config["total_dezenas"]
+    minimo, maximo = config["faixa_dezenas"]
+
+    fora = np.flatnonzero(lote.mascaras >> np.uint64(total))
+    if fora.size:
+        i = int(fora[0])
+        return f"Jogo {i + 1}: dezenas devem estar entre 1 e {total} ({lote[i].dezenas()})."
+
+    qtds = lote.qtd_dezenas()
+    errados = np.flatnonzero((qtds < minimo) | (qtds > maximo))
+    if errados.size:
+        i = int(errados[0])
+        return f"Jogo {i + 1}: {int(qtds[i])} dezenas; cada jogo deve ter de {minimo} a {maximo}."
+    return None
+
+
+@app.post("/api/<jogo>/backtest")
+def api_backtest(jogo: str):
+    """
+    Corpo JSON: {"jogos": [[...], ...]} ou {"registro": "<id do histórico>"}.
+    Cada jogo: dezenas distintas de 1 a total_dezenas, quantidade em faixa_dezenas (400 se não).
+    Resposta: acertos por faixa (quadra/quina/sena; 11–15 na Lotofácil).
+    """
+    if jogo not in FAIXAS_BACKTEST:
+        return _erro_api(f"Jogo desconhecido: {jogo}", 404)
+
+    dados = _corpo_json()
+    if dados is None:
+        return _erro_api("Corpo JSON deve ser um objeto.")
+    if dados.get("registro"):
+        registro = INDICE_HISTORICO.obter(str(dados["registro"]))
+        if registro is None or registro.get("jogo") != jogo:
+            return _erro_api("Registro não encontrado.", 404)
+        jogos = registro.get("surpresinhas") or []
+    else:
+        jogos = dados.get("jogos")
+        if not isinstance(jogos, list) or not jogos or not all(isinstance(j, list) for j in jogos):
+            return _erro_api("Informe jogos (lista de listas de dezenas) ou registro.")
+
+    if len(jogos) > API_BACKTEST_MAX_JOGOS:
+        return _erro_api(f"No máximo {API_BACKTEST_MAX_JOGOS} jogos por backtest.")
+
+    try:
+        lote = LoteJogos.de_listas(jogos)  # dezena repetida ou fora de 1..64: ValueError
+    except (TypeError, ValueError) as e:
+        return _erro_api(f"Erro de validação dos dados: {e}")
+    erro = _validar_jogos(lote, API_JOGOS[jogo])
+    if erro:
+        return _erro_api(f"Erro de validação dos dados: {erro}")
+
+    try:
+        resultado = backtest(jogo, lote)
+    except (TypeError, ValueError) as e:
+        return _erro_api(f"Erro de validação dos dados: {e}")
+    except RuntimeError as e:
+        return _erro_api(str(e), 503)
+
+    return jsonify(resultado)
+
+
+# =====================================================
+# Fechamento (desdobramento) com garantia de acertos
+# =====================================================
+
+@app.post("/api/<jogo>/fechamento")
+def api_fechamento(jogo: str):
+    """
+    Corpo JSON: dezenas (as escolhidas), acertos (garantia), sorteadas (opcional:
+    quantas das escolhidas precisam sair; padrão = dezenas do sorteio),
+    qtd_dezenas (opcional, por jogo).
+    Resposta: jogos do fechamento (resultados repetidos vêm do cache);
+    422 se passar dos limites de jogos ou de tempo.
+    """
+    config = API_JOGOS.get(jogo)
+    if config is None:
+        return _erro_api(f"Jogo desconhecido: {jogo}", 404)
+
+    dados = _corpo_json()
+    if dados is None:
+        return _erro_api("Corpo JSON deve ser um objeto.")
+    dezenas = dados.get("dezenas")
+    if not isinstance(dezenas, list) or not dezenas:
+        return _erro_api("Informe dezenas (lista com as dezenas escolhidas).")
+
+    try:
+        sorteio = config["qtd_dezenas"]
+        dezenas = [int(d) for d in dezenas]
+        acertos = int(dados.get("acertos", 0))
+        sorteadas = int(dados.get("sorteadas", sorteio))
+        qtd_dezenas = int(dados.get("qtd_dezenas", sorteio))
+        resultado = config["fechamento"](dezenas, acertos, sorteadas, qtd_dezenas)
+    except FechamentoGrandeDemais as e:
+        return _erro_api(str(e), 422)
+    except (TypeError, ValueError) as e:
+        return _erro_api(f"Erro de validação dos dados: {e}")
+
+    return jsonify(resultado)
+
+
+# =====================================================
+# Estatísticas (frequência, atraso, pares) com cache HTTP
+# =====================================================
+
+# Um concurso novo sai no máximo uma vez por dia; o ETag cobre a revalidação.
+STATS_MAX_AGE = int(os.getenv("MEGASURP_STATS_MAX_AGE", "300"))
+
+
+@app.get("/api/<jogo>/stats")
+def api_stats(jogo: str):
+    if jogo not in TOTAL_DEZENAS:
+        return _erro_api(f"Jogo desconhecido: {jogo}", 404)
+
+    if not ESTATISTICAS.obter(jogo).qtd_sorteios:
+        return _erro_api(str(HistoricoVazio(jogo)), 503)
+
+    corpo, etag = ESTATISTICAS.json_com_etag(jogo)
+    resp = Response(corpo, mimetype="application/json")
+    return _condicional(resp, f"public, max-age={STATS_MAX_AGE}", etag)
 
 
 if __name__ == "__main__":